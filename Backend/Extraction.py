@@ -1,29 +1,45 @@
 import re
 from datetime import date, datetime
-from typing import Dict
+from typing import Dict, Tuple, Union
 import logging
 from io import BytesIO
-import numpy as np
-import easyocr
-from pdf2image import convert_from_bytes
-from PIL import Image
-import PyPDF2
-from dotenv import load_dotenv
-from langchain_core.prompts import PromptTemplate
-from langchain_groq import ChatGroq
-from langchain_core.runnables import RunnableSequence
+from PIL import Image, ImageOps
 from dateutil import parser
 import os
+import sys
+import threading
+import hashlib
+import tempfile
+from contextlib import contextmanager, ExitStack
+from dataclasses import dataclass
+from queue import Queue, Empty
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
 from datetime import date
 from typing import Optional, List
-from pydantic import BaseModel, Field, validator
 from enum import Enum
-from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, create_engine
-from sqlalchemy.orm import declarative_base, relationship, sessionmaker
-from sqlalchemy.ext.hybrid import hybrid_property
 
-load_dotenv()
-groq_api_key = os.getenv("GROQ_API_KEY")
+from config import (
+    GROQ_API_KEY,
+    OCR_LANGUAGES,
+    OCR_USE_GPU,
+    OCR_POOL_SIZE,
+    OCR_READER_MEMORY_MB,
+    PDF_OCR_DPI,
+    PDF_OCR_WINDOW,
+    PDF_OCR_STOP_AT_TOTALS,
+    OCR_PREPROCESS_PROFILE,
+    BATCH_PROCESS_WORKERS,
+    LLM_PACK_MAX_RECEIPTS,
+    LLM_PACK_MAX_CHARS,
+    LLM_PACK_ITEM_MAX_CHARS,
+    RULES_CONFIDENCE_THRESHOLD,
+)
+from cache import parse_cache
+from llm import as_client, get_llm_client, llm_client_loaded, pack_items, plan_packs, split_results
+from metrics import stage_timer, timed
+
+groq_api_key = GROQ_API_KEY
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -38,10 +54,447 @@ class CategoryEnum(str, Enum):
     HEALTH = "Health"
     OTHER = "Other"
 
-class ReceiptProcessor:
-    def __init__(self):
-        self.groq_api_key = groq_api_key
-        self.template = """
+def _available_memory_mb() -> Optional[int]:
+    """Best-effort physical memory size in MB, None if unknown"""
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def _default_pool_size() -> int:
+    """Pool size bounded by CPU cores and by how many readers fit in half of RAM"""
+    size = OCR_POOL_SIZE if OCR_POOL_SIZE > 0 else os.cpu_count() or 1
+    size = min(size, os.cpu_count() or 1)
+    memory_mb = _available_memory_mb()
+    if memory_mb and OCR_READER_MEMORY_MB > 0:
+        size = min(size, max(1, (memory_mb // 2) // OCR_READER_MEMORY_MB))
+    return max(1, size)
+
+
+class OCRReaderPool:
+    """Process-wide pool of warm EasyOCR readers.
+
+    Readers are created lazily on first checkout (or eagerly via warm_up) and
+    reused across requests, so the model is loaded at most `size` times per process.
+    """
+
+    def __init__(self, size: Optional[int] = None, languages: Optional[List[str]] = None, gpu: bool = OCR_USE_GPU):
+        self.size = size or _default_pool_size()
+        self.languages = languages or OCR_LANGUAGES
+        self.gpu = gpu
+        self._idle: Queue = Queue()
+        self._created = 0
+        self._loaded = 0
+        self._lock = threading.Lock()
+
+    @property
+    def created(self) -> int:
+        return self._created
+
+    def _new_reader(self):
+        logger.info(f"Loading EasyOCR reader (pool size {self.size}, languages={self.languages}, gpu={self.gpu})")
+        with stage_timer("ocr_reader_init"):
+            import easyocr
+            reader = easyocr.Reader(self.languages, gpu=self.gpu)
+        with self._lock:
+            self._loaded += 1
+        return reader
+
+    def warm_up(self, count: int = 1):
+        """Pre-load up to `count` readers so the first OCR request does not pay model load"""
+        readers = []
+        for _ in range(min(count, self.size)):
+            with self._lock:
+                if self._created >= self.size or self._created >= count:
+                    break
+                self._created += 1
+            try:
+                readers.append(self._new_reader())
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        for reader in readers:
+            self._idle.put(reader)
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self._new_reader()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        # Pool exhausted: wait for a reader to be returned
+        return self._idle.get()
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": self.size, "created": self._created, "loaded": self._loaded, "idle": self._idle.qsize()}
+
+    @contextmanager
+    def reader(self):
+        """Check out a reader for the duration of the block"""
+        reader = self._acquire()
+        try:
+            yield reader
+        finally:
+            self._idle.put(reader)
+
+
+_ocr_pool: Optional[OCRReaderPool] = None
+_ocr_pool_lock = threading.Lock()
+
+
+def get_ocr_pool() -> OCRReaderPool:
+    """Return the process-wide OCR reader pool, creating it on first use"""
+    global _ocr_pool
+    if _ocr_pool is None:
+        with _ocr_pool_lock:
+            if _ocr_pool is None:
+                _ocr_pool = OCRReaderPool()
+    return _ocr_pool
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def _init_ocr_worker():
+    """Process-pool initializer: each worker process keeps a single warm reader"""
+    global _ocr_pool
+    _ocr_pool = OCRReaderPool(size=1)
+
+
+@dataclass(frozen=True)
+class PreprocessProfile:
+    """Steps applied to an image before OCR; EXIF orientation is always corrected"""
+    grayscale: bool = True
+    crop: bool = True
+    deskew: bool = True
+    max_skew: float = 5.0  # degrees searched either side of horizontal
+    skew_step: float = 0.5
+    max_side: int = 2000  # hard cap on the longer side, in pixels
+    text_height: int = 24  # target median text line height; 0 disables
+
+
+PREPROCESS_PROFILES: Dict[str, Optional[PreprocessProfile]] = {
+    "off": None,
+    "fast": PreprocessProfile(deskew=False, max_side=1600, text_height=20),
+    "balanced": PreprocessProfile(),
+    "quality": PreprocessProfile(max_skew=10.0, skew_step=0.25, max_side=3000, text_height=32),
+}
+
+
+def _otsu_threshold(pixels) -> int:
+    """Gray level that best separates ink from paper"""
+    import numpy as np
+    hist = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    weight_low = np.cumsum(hist)
+    weight_high = weight_low[-1] - weight_low
+    cum_mean = np.cumsum(hist * np.arange(256))
+    mean_low = cum_mean / np.maximum(weight_low, 1)
+    mean_high = (cum_mean[-1] - cum_mean) / np.maximum(weight_high, 1)
+    return int(np.argmax(weight_low * weight_high * (mean_low - mean_high) ** 2))
+
+
+def _thumbnail(gray: Image.Image, size: int) -> Image.Image:
+    small = gray.copy()
+    small.thumbnail((size, size))
+    return small
+
+
+def _receipt_bbox(gray: Image.Image) -> Optional[Tuple[int, int, int, int]]:
+    """Bounding box of the bright paper region, or None when it fills the frame"""
+    import numpy as np
+    small = _thumbnail(gray, 400)
+    pixels = np.asarray(small)
+    paper = pixels > _otsu_threshold(pixels)
+    # Rows/columns crossing the receipt hold far more paper than background ones
+    row_density, col_density = paper.mean(axis=1), paper.mean(axis=0)
+    rows = np.flatnonzero(row_density > 0.5 * row_density.max())
+    cols = np.flatnonzero(col_density > 0.5 * col_density.max())
+    if not rows.size or not cols.size:
+        return None
+    area = (rows[-1] - rows[0] + 1) * (cols[-1] - cols[0] + 1) / paper.size
+    if area > 0.9 or area < 0.1:
+        return None
+    scale = gray.width / small.width
+    margin = int(0.02 * max(gray.size))
+    return (
+        max(0, int(cols[0] * scale) - margin),
+        max(0, int(rows[0] * scale) - margin),
+        min(gray.width, int((cols[-1] + 1) * scale) + margin),
+        min(gray.height, int((rows[-1] + 1) * scale) + margin),
+    )
+
+
+def _inner(gray: Image.Image, inset: float = 0.1) -> Image.Image:
+    """Central region, so background left at the edges after cropping does not count as ink"""
+    dx, dy = int(gray.width * inset), int(gray.height * inset)
+    return gray.crop((dx, dy, gray.width - dx, gray.height - dy))
+
+
+def _estimate_skew(gray: Image.Image, max_skew: float, step: float) -> float:
+    """Rotation (degrees) that makes text lines horizontal, by projection-profile variance"""
+    import numpy as np
+    pixels = np.asarray(_thumbnail(_inner(gray), 800))
+    ink = Image.fromarray(((pixels < _otsu_threshold(pixels)) * 255).astype(np.uint8))
+
+    def score(angle: float) -> float:
+        return float(np.var(np.asarray(ink.rotate(angle, expand=True), dtype=np.float32).sum(axis=1)))
+
+    # Leave the image alone unless some rotation is strictly better (e.g. blank pages)
+    best_angle, best_score = 0.0, score(0.0)
+    for angle in np.arange(-max_skew, max_skew + step / 2, step):
+        angle_score = score(float(angle))
+        if angle_score > best_score:
+            best_angle, best_score = float(angle), angle_score
+    return best_angle
+
+
+def _estimate_text_height(gray: Image.Image) -> Optional[float]:
+    """Median height in pixels of runs of rows containing ink, i.e. text lines.
+    Measured in vertical strips so residual skew does not merge neighbouring lines."""
+    import numpy as np
+    pixels = np.asarray(_inner(gray))
+    ink = pixels < _otsu_threshold(pixels)
+    heights = []
+    for strip in np.array_split(ink, 4, axis=1):
+        rows = strip.mean(axis=1) > 0.01
+        edges = np.diff(np.concatenate(([0], rows.astype(np.int8), [0])))
+        runs = np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+        heights.extend(runs[runs >= 3])
+    return float(np.median(heights)) if len(heights) >= 3 else None
+
+
+def preprocess_image(image: Image.Image, profile: Union[str, PreprocessProfile, None] = OCR_PREPROCESS_PROFILE) -> Image.Image:
+    """Shrink and clean up an image for OCR: fix EXIF rotation, convert to grayscale,
+    crop to the receipt, deskew and scale so text lines are about `text_height` pixels"""
+    if isinstance(profile, str):
+        profile = PREPROCESS_PROFILES[profile]
+    if profile is None:
+        return image
+    image = ImageOps.exif_transpose(image)
+    image = image.convert("L") if profile.grayscale else image.convert("RGB")
+    if max(image.size) > profile.max_side:
+        image.thumbnail((profile.max_side, profile.max_side), Image.Resampling.LANCZOS)
+    gray = image if profile.grayscale else image.convert("L")
+
+    if profile.crop:
+        bbox = _receipt_bbox(gray)
+        if bbox:
+            image = image.crop(bbox)
+            gray = image if profile.grayscale else image.convert("L")
+
+    if profile.deskew:
+        angle = _estimate_skew(gray, profile.max_skew, profile.skew_step)
+        if abs(angle) >= profile.skew_step:
+            fill = 255 if profile.grayscale else (255, 255, 255)
+            image = image.rotate(angle, resample=Image.Resampling.BICUBIC, expand=True, fillcolor=fill)
+            gray = image if profile.grayscale else image.convert("L")
+
+    if profile.text_height:
+        text_height = _estimate_text_height(gray)
+        # Only ever downscale; upscaling adds pixels without adding detail
+        if text_height and text_height > profile.text_height * 1.25:
+            scale = profile.text_height / text_height
+            size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+            image = image.resize(size, Image.Resampling.LANCZOS)
+    return image
+
+
+def _read_image(reader, image) -> str:
+    import numpy as np
+    with stage_timer("ocr_preprocess"):
+        image = preprocess_image(image)
+    with stage_timer("ocr"):
+        result = reader.readtext(np.array(image), detail=0, paragraph=True)
+    return "\n".join(result)
+
+
+def _ocr_image(image) -> str:
+    with get_ocr_pool().reader() as reader:
+        return _read_image(reader, image)
+
+
+def ocr_image_file(file_path: str) -> str:
+    """OCR a single image file (in a worker process, or in-process for single uploads)"""
+    with Image.open(file_path) as image:
+        return _ocr_image(image)
+
+
+def ocr_pdf_page(file_path: str, page_number: int) -> str:
+    """Rasterize and OCR one PDF page, 1-indexed (runs inside a worker process)"""
+    from pdf2image import convert_from_path
+    with stage_timer("pdf_rasterize"):
+        images = convert_from_path(file_path, dpi=PDF_OCR_DPI, first_page=page_number, last_page=page_number)
+    try:
+        return "\n".join(_ocr_image(img) for img in images)
+    finally:
+        for img in images:
+            img.close()
+
+
+# Pages with fewer characters than this in their text layer are treated as scanned
+MIN_TEXT_LAYER_CHARS = 10
+
+
+def _has_text_layer(page_text: str) -> bool:
+    return len(page_text.strip()) >= MIN_TEXT_LAYER_CHARS
+
+
+def _pdf_page_texts(source) -> List[str]:
+    """Text layer of each page of a PDF (path, bytes or binary stream); empty for scanned pages"""
+    import PyPDF2
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+    pdf_reader = PyPDF2.PdfReader(source)
+    return [page.extract_text() or "" for page in pdf_reader.pages]
+
+
+def _has_totals(text: str) -> bool:
+    """True when the text contains a receipt total, i.e. the rest of the document can be skipped"""
+    return any(pattern.search(text) for pattern, _ in RuleBasedExtractor.AMOUNT_PATTERNS)
+
+
+def iter_pdf_page_images(file_path: str, page_numbers: List[int], dpi: int = PDF_OCR_DPI, window: int = PDF_OCR_WINDOW):
+    """Yield (page_number, image) for the given 1-indexed pages, rendering at most
+    `window` consecutive pages at a time; each window is released before the next one"""
+    from pdf2image import convert_from_path
+    i = 0
+    while i < len(page_numbers):
+        # Extend the window over consecutive page numbers only
+        j = i + 1
+        while j < len(page_numbers) and j - i < window and page_numbers[j] == page_numbers[j - 1] + 1:
+            j += 1
+        with stage_timer("pdf_rasterize"):
+            images = convert_from_path(file_path, dpi=dpi, first_page=page_numbers[i], last_page=page_numbers[j - 1])
+        try:
+            for page_number, image in zip(page_numbers[i:j], images):
+                yield page_number, image
+        finally:
+            for image in images:
+                image.close()
+        i = j
+
+
+def extract_pdf_text(file_path: str, stop_at_totals: bool = PDF_OCR_STOP_AT_TOTALS) -> str:
+    """Text of a PDF, page by page: pages with a text layer are read directly and only
+    scanned pages are rasterized and OCRed. With `stop_at_totals`, scanned pages after
+    the first one containing a receipt total are not OCRed; text-layer pages cost
+    nothing to read and are always kept, since the stored text is all re-parsing sees."""
+    with open(file_path, "rb") as f:
+        page_texts = _pdf_page_texts(f)
+    scanned = [n for n, page_text in enumerate(page_texts, 1) if not _has_text_layer(page_text)]
+    images = iter_pdf_page_images(file_path, scanned)
+    blocks = []
+    try:
+        with ExitStack() as stack:
+            reader = None
+            totals_page = None
+            for page_number, page_text in enumerate(page_texts, 1):
+                if not _has_text_layer(page_text):
+                    if totals_page is not None:
+                        continue
+                    if reader is None:
+                        reader = stack.enter_context(get_ocr_pool().reader())
+                    _, image = next(images)
+                    page_text = _read_image(reader, image)
+                blocks.append(page_text)
+                if stop_at_totals and totals_page is None and _has_totals(page_text):
+                    totals_page = page_number
+            skipped = sum(1 for n in scanned if totals_page is not None and n > totals_page)
+            if skipped:
+                logger.info(f"Totals found on page {totals_page}, skipped OCR of {skipped} remaining scanned pages")
+    finally:
+        images.close()
+    return "\n".join(blocks).strip()
+
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Process pool used to fan OCR work for batches out across cores"""
+    global _process_pool
+    if _process_pool is None:
+        with _process_pool_lock:
+            if _process_pool is None:
+                _process_pool = ProcessPoolExecutor(
+                    max_workers=BATCH_PROCESS_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_ocr_worker,
+                )
+    return _process_pool
+
+
+# The OCR (easyocr/torch), PDF and LLM stacks are imported on first use so the API
+# starts without them; warm_up_engines loads them ahead of the first upload instead.
+def warm_up_engines(ocr_reader: bool = False):
+    """Import the PDF, LLM and OCR stacks, optionally loading one OCR reader too"""
+    for engine, warm in (("pdf", _warm_pdf), ("llm", _warm_llm), ("ocr", _warm_ocr)):
+        try:
+            with stage_timer(f"warmup_{engine}"):
+                warm()
+        except Exception as e:
+            logger.warning(f"Warming up {engine} failed: {e}")
+    if ocr_reader:
+        try:
+            get_ocr_pool().warm_up()
+        except Exception as e:
+            logger.warning(f"Loading OCR reader failed: {e}")
+
+
+def _warm_pdf():
+    import pdf2image  # noqa: F401
+    import PyPDF2  # noqa: F401
+
+
+def _warm_llm():
+    get_llm_client()
+
+
+def _warm_ocr():
+    import easyocr  # noqa: F401
+
+
+def engine_status() -> Dict[str, bool]:
+    """Which engines are loaded in this process, without triggering any imports"""
+    return {
+        "pdf": "pdf2image" in sys.modules and "PyPDF2" in sys.modules,
+        "llm": llm_client_loaded(),
+        "ocr": "easyocr" in sys.modules,
+        "ocr_reader": _ocr_pool is not None and _ocr_pool.stats()["loaded"] > 0,
+        "vendor_categories": rule_extractor.loaded,
+    }
+
+
+def _sanitize_amount(raw: str) -> float:
+    """Remove currency symbols and commas, return float"""
+    if not raw:
+        return 0.0
+    clean = ''.join(c for c in raw if c.isdigit() or c == '.')
+    try:
+        return float(clean)
+    except ValueError:
+        return 0.0
+
+
+def _normalize_text(text: str) -> str:
+    """Case- and whitespace-insensitive form of OCR text used for cache keys"""
+    return " ".join(text.lower().split())
+
+
+RECEIPT_PROMPT_TEMPLATE = """
             You will be given OCR text from a receipt or invoice.
             Extract the following fields from the text:
             - Vendor Name
@@ -61,43 +514,353 @@ class ReceiptProcessor:
             {text}
         """
 
+# Several short receipts in one call; answers come back per id and are split by llm.split_results
+PACKED_PROMPT_TEMPLATE = """
+            You will be given OCR text from {count} receipts or invoices, each inside <receipt id="N"> tags.
+            For each receipt extract the following fields from its text only:
+            - Vendor Name
+            - Date
+            - Total Amount
+            - Category (food, transport, utilities, shopping, entertainment, health, others)
+            - Description (a short summary including important details)
+
+            Return one block per receipt, strictly in this format, keeping the receipt's id:
+            <result id="N">
+            <vendor>...</vendor>
+            <date>...</date>
+            <amount>...</amount>
+            <category>...</category>
+            <description>...</description>
+            </result>
+
+            Receipts:
+            {receipts}
+        """
+
+# Bump whenever the prompt or response parsing changes so cached parses are not reused
+PROMPT_VERSION = "1"
+
+class RuleBasedExtractor:
+    """Deterministic fast-path extractor for receipts with obvious fields.
+
+    Pulls amount, date and vendor out with compiled regexes and maps the
+    vendor to a category using a table learned from existing documents. The
+    result carries a confidence score; callers fall back to the LLM when it is
+    below the threshold.
+    """
+
+    AMOUNT_PATTERNS = [
+        (re.compile(r"(?:grand\s+total|total\s+amount|amount\s+due|balance\s+due|net\s+payable|total\s+due)"
+                    r"[^\d\n]{0,20}([\d,]+(?:\.\d{1,2})?)", re.IGNORECASE), 0.4),
+        (re.compile(r"\btotal\b[^\d\n]{0,20}([\d,]+(?:\.\d{1,2})?)", re.IGNORECASE), 0.3),
+    ]
+    DATE_PATTERNS = [
+        (re.compile(r"\b(\d{4}-\d{1,2}-\d{1,2})\b"), False),
+        (re.compile(r"\b(\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4})\b"), True),
+        (re.compile(r"\b(\d{1,2}\s+[A-Za-z]{3,9},?\s+\d{4})\b"), True),
+        (re.compile(r"\b([A-Za-z]{3,9}\s+\d{1,2},?\s+\d{4})\b"), False),
+    ]
+    CATEGORY_KEYWORDS = {
+        CategoryEnum.FOOD: ("restaurant", "cafe", "coffee", "pizza", "food", "dine", "kitchen", "bakery", "grocery"),
+        CategoryEnum.TRANSPORT: ("uber", "ola", "taxi", "cab", "fuel", "petrol", "diesel", "airline", "railway", "metro"),
+        CategoryEnum.UTILITIES: ("electricity", "water bill", "gas bill", "internet", "broadband", "mobile bill", "power"),
+        CategoryEnum.ENTERTAINMENT: ("cinema", "movie", "theatre", "netflix", "spotify", "concert"),
+        CategoryEnum.SHOPPING: ("mart", "store", "supermarket", "mall", "fashion", "retail"),
+        CategoryEnum.HEALTH: ("pharmacy", "hospital", "clinic", "medical", "chemist", "diagnostic"),
+    }
+    VENDOR_SKIP_WORDS = ("invoice", "receipt", "tax", "bill", "gst", "date", "cash memo", "order")
+
+    def __init__(self, threshold: float = RULES_CONFIDENCE_THRESHOLD):
+        self.threshold = threshold
+        self.attempts = 0
+        self.hits = 0
+        self._vendor_categories: Dict[str, str] = {}
+        self._vendor_names: Dict[str, str] = {}
+        self._vendor_pattern = None
+        self._lock = threading.Lock()
+        self._loaded = threading.Event()
+        self._loaded.set()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded.is_set()
+
+    def begin_loading(self):
+        """Defer every receipt to the LLM until load_vendor_categories finishes, since
+        without the vendor table the rules would settle for keyword guesses"""
+        self._loaded.clear()
+
+    def load_vendor_categories(self, mapping: Dict[str, str]):
+        """Load the vendor -> category table (e.g. learned from the documents table); pairs
+        learned while it was being read are newer, so they win"""
+        with self._lock:
+            learned = dict(self._vendor_categories)
+            names = dict(self._vendor_names)
+            self._vendor_categories = {}
+            self._vendor_names = {}
+            for vendor, category in mapping.items():
+                self._learn(vendor, category)
+            for key, category in learned.items():
+                self._learn(names[key], category)
+        self._loaded.set()
+
+    def learn(self, vendor: str, category: str):
+        with self._lock:
+            self._learn(vendor, category)
+
+    def _learn(self, vendor: str, category: str):
+        key = _normalize_text(vendor or "")
+        if len(key) < 3 or not category:
+            return
+        if key not in self._vendor_names:
+            # Only a new name changes the alternation; re-learning a vendor keeps the compiled pattern
+            self._vendor_pattern = None
+        self._vendor_categories[key] = category
+        self._vendor_names[key] = vendor.strip()
+
+    def _match_known_vendor(self, text: str) -> Optional[Tuple[str, str]]:
+        """(vendor name, category) of a learned vendor mentioned near the top of the text"""
+        with self._lock:
+            if not self._vendor_names:
+                return None
+            if self._vendor_pattern is None:
+                names = sorted(self._vendor_names, key=len, reverse=True)
+                # Lookarounds rather than \b, which never matches after a name ending in punctuation ("Toys R Us.")
+                self._vendor_pattern = re.compile(r"(?<!\w)(" + "|".join(re.escape(name) for name in names) + r")(?!\w)")
+            match = self._vendor_pattern.search(_normalize_text(text[:500]))
+            if not match:
+                return None
+            return self._vendor_names[match.group(1)], self._vendor_categories[match.group(1)]
+
+    def _find_amount(self, text: str):
+        for pattern, weight in self.AMOUNT_PATTERNS:
+            matches = pattern.findall(text)
+            if matches:
+                # The last total on a receipt is usually the final payable amount
+                amount = _sanitize_amount(matches[-1])
+                if amount > 0:
+                    return amount, weight
+        return 0.0, 0.0
+
+    def _find_date(self, text: str) -> str:
+        for pattern, dayfirst in self.DATE_PATTERNS:
+            match = pattern.search(text)
+            if not match:
+                continue
+            try:
+                return parser.parse(match.group(1), dayfirst=dayfirst).strftime('%Y-%m-%d')
+            except (ValueError, OverflowError):
+                continue
+        return ""
+
+    def _guess_vendor(self, text: str) -> str:
+        for line in text.splitlines()[:5]:
+            line = line.strip()
+            letters = sum(c.isalpha() for c in line)
+            if letters < 3 or letters < len(line) / 2:
+                continue
+            if any(word in line.lower() for word in self.VENDOR_SKIP_WORDS):
+                continue
+            return line[:100]
+        return ""
+
+    def _keyword_category(self, text: str) -> str:
+        lowered = text.lower()
+        for category, keywords in self.CATEGORY_KEYWORDS.items():
+            if any(keyword in lowered for keyword in keywords):
+                return category.value
+        return ""
+
+    def extract(self, text: str) -> Tuple[Dict, float]:
+        """Return (fields, confidence between 0 and 1)"""
+        amount, confidence = self._find_amount(text)
+        date_ = self._find_date(text)
+        if date_:
+            confidence += 0.25
+
+        known_vendor = self._match_known_vendor(text)
+        if known_vendor:
+            vendor, category = known_vendor
+            confidence += 0.35
+        else:
+            # Guesses alone never reach the default threshold
+            vendor = self._guess_vendor(text)
+            category = self._keyword_category(text)
+            confidence += (0.05 if vendor else 0.0) + (0.05 if category else 0.0)
+
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        fields = {
+            "vendor_name": vendor,
+            "date": date_,
+            "amount": amount,
+            "category": category,
+            "description": " ".join(lines[:3])[:200]
+        }
+        return fields, round(min(confidence, 1.0), 2)
+
+    def try_extract(self, text: str) -> Optional[Dict]:
+        """Fields if the rules are confident enough, otherwise None"""
+        if not self._loaded.is_set():
+            return None
+        fields, confidence = self.extract(text)
+        with self._lock:
+            self.attempts += 1
+            if confidence >= self.threshold:
+                self.hits += 1
+                return fields
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "attempts": self.attempts,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.attempts, 4) if self.attempts else 0.0,
+            "known_vendors": len(self._vendor_categories),
+            "vendor_table_loaded": self.loaded,
+            "threshold": self.threshold
+        }
+
+
+rule_extractor = RuleBasedExtractor()
+
+
+class ReceiptProcessor:
+    def __init__(self, llm=None, cache=None, fast_path: Optional[RuleBasedExtractor] = rule_extractor):
+        """`llm` overrides the shared LLM client (an LLMClient, an LLMBackend such as llm.LocalBackend, or a
+        LangChain runnable); `cache` overrides the parse cache; `fast_path` is tried before the LLM (None disables it)"""
+        self.groq_api_key = groq_api_key
+        self.template = RECEIPT_PROMPT_TEMPLATE
+        self.llm = llm
+        self.parse_cache = cache if cache is not None else parse_cache
+        self.fast_path = fast_path
+        self._client = None
+
     def process_uploaded_file(self, file_bytes: bytes, file_extension: str) -> Dict:
         """Process uploaded file and return extracted data"""
+        _, extracted_data = self.process_with_text(file_bytes, file_extension)
+        return extracted_data
+
+    def process_with_text(self, file_bytes: bytes, file_extension: str) -> Tuple[str, Dict]:
+        """Process uploaded file and return (extracted text, extracted data)"""
+        return self._process(lambda: self._extract_text(file_bytes, file_extension))
+
+    def process_file_with_text(self, file_path: str, file_extension: Optional[str] = None) -> Tuple[str, Dict]:
+        """Like process_with_text for a file on disk; the file is never read into memory as a whole"""
+        return self._process(lambda: self.extract_text_from_path(file_path, file_extension))
+
+    def _process(self, extract) -> Tuple[str, Dict]:
         try:
-            text = self._extract_text(file_bytes, file_extension)
+            text = extract()
             extracted_data = self._parse_receipt_text(text)
-            extracted_data["raw_text"] = extracted_data.get("description")
-            return extracted_data
+            extracted_data["raw_text"] = text
+            extracted_data["extractor_version"] = self.extractor_version
+            return text, extracted_data
         except Exception as e:
             logger.error(f"Error processing file: {e}")
             raise
 
+    def process_batch(self, file_paths: List[str]) -> List[Union[Dict, Exception]]:
+        """Process saved files in bulk; failures are returned in place of results"""
+        texts = self.extract_batch(file_paths)
+        ok = [i for i, text in enumerate(texts) if not isinstance(text, Exception)]
+        results: List[Union[Dict, Exception]] = list(texts)
+        for i, extracted_data in zip(ok, self.parse_batch([texts[i] for i in ok])):
+            if not isinstance(extracted_data, Exception):
+                extracted_data["raw_text"] = texts[i]
+                extracted_data["extractor_version"] = self.extractor_version
+            results[i] = extracted_data
+        return results
+
+    @timed("extract_batch")
+    def extract_batch(self, file_paths: List[str]) -> List[Union[str, Exception]]:
+        """Extract text from many files, OCRing images and scanned PDF pages in parallel"""
+        pool = get_process_pool()
+        pending = []
+        for file_path in file_paths:
+            file_extension = os.path.splitext(file_path)[1].lower()
+            try:
+                if file_extension in IMAGE_EXTENSIONS:
+                    pending.append([pool.submit(ocr_image_file, file_path)])
+                elif file_extension == '.pdf':
+                    with open(file_path, "rb") as f:
+                        page_texts = _pdf_page_texts(f)
+                    # Text-layer pages are used as-is; only scanned pages go to the OCR workers
+                    pending.append([
+                        page_text if _has_text_layer(page_text) else pool.submit(ocr_pdf_page, file_path, page_number)
+                        for page_number, page_text in enumerate(page_texts, 1)
+                    ])
+                elif file_extension == '.txt':
+                    with open(file_path, "rb") as f:
+                        pending.append(f.read().decode('utf-8'))
+                else:
+                    raise ValueError(f"Unsupported file type: {file_extension}")
+            except Exception as e:
+                logger.error(f"Text extraction failed for {file_path}: {e}")
+                pending.append(e)
+
+        texts: List[Union[str, Exception]] = []
+        for item in pending:
+            if isinstance(item, list):
+                try:
+                    texts.append(self._collect_pages(item))
+                except Exception as e:
+                    logger.error(f"OCR failed: {e}")
+                    texts.append(e)
+            else:
+                texts.append(item)
+        return texts
+
+    @staticmethod
+    def _collect_pages(pages: List) -> str:
+        """Join per-page text/futures in page order; after the totals page, OCR of scanned pages
+        is cancelled, while text-layer pages are still kept"""
+        blocks = []
+        totals_found = False
+        for page in pages:
+            if isinstance(page, Future):
+                if totals_found:
+                    page.cancel()
+                    continue
+                page_text = page.result()
+            else:
+                page_text = page
+            blocks.append(page_text)
+            if PDF_OCR_STOP_AT_TOTALS and _has_totals(page_text):
+                totals_found = True
+        return "\n".join(blocks).strip()
+
+    @timed("extract_text")
+    def extract_text_from_path(self, file_path: str, file_extension: Optional[str] = None) -> str:
+        """Extract text from a saved file: images are decoded from disk, PDFs rasterized page by page"""
+        file_extension = (file_extension or os.path.splitext(file_path)[1]).lower()
+        try:
+            if file_extension in IMAGE_EXTENSIONS:
+                return ocr_image_file(file_path)
+            elif file_extension == '.pdf':
+                return extract_pdf_text(file_path)
+            elif file_extension == '.txt':
+                with open(file_path, encoding='utf-8') as f:
+                    return f.read()
+            else:
+                raise ValueError(f"Unsupported file type: {file_extension}")
+        except Exception as e:
+            logger.error(f"Text extraction failed: {e}")
+            raise
+
+    @timed("extract_text")
     def _extract_text(self, file_bytes: bytes, file_extension: str) -> str:
         """Extract text from various file types using EasyOCR and direct PDF extraction"""
         try:
-            reader = easyocr.Reader(['en'], gpu=False)
-            if file_extension.lower() in ('.jpg', '.jpeg', '.png'):
-                image = Image.open(BytesIO(file_bytes))
-                result = reader.readtext(np.array(image), detail=0, paragraph=True)
-                return "\n".join(result)
+            if file_extension.lower() in IMAGE_EXTENSIONS:
+                return _ocr_image(Image.open(BytesIO(file_bytes)))
             elif file_extension.lower() == '.pdf':
-                # Try direct text extraction first
-                pdf_reader = PyPDF2.PdfReader(BytesIO(file_bytes))
-                text_blocks = []
-                for page in pdf_reader.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text_blocks.append(page_text)
-                text = "\n".join(text_blocks).strip()
-                # If direct extraction fails, use OCR
-                if not text or len(text) < 10:
-                    images = convert_from_bytes(file_bytes)
-                    ocr_blocks = []
-                    for img in images:
-                        result = reader.readtext(np.array(img), detail=0, paragraph=True)
-                        ocr_blocks.append("\n".join(result))
-                    text = "\n".join(ocr_blocks)
-                return text
+                # pdf2image renders from a file, so spool the upload once rather than per page
+                with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+                    tmp.write(file_bytes)
+                try:
+                    return extract_pdf_text(tmp.name)
+                finally:
+                    os.remove(tmp.name)
             elif file_extension.lower() == '.txt':
                 return file_bytes.decode('utf-8')
             else:
@@ -107,25 +870,103 @@ class ReceiptProcessor:
             raise
     def _sanitize_amount(self, raw: str) -> float:
         """Remove currency symbols and commas, return float"""
-        if not raw:
-            return 0.0
-        clean = ''.join(c for c in raw if c.isdigit() or c == '.')
-        try:
-            return float(clean)
-        except ValueError:
-            return 0.0
+        return _sanitize_amount(raw)
+
+    @property
+    def client(self):
+        # Resolved on first use so constructing a processor does not import the LLM stack
+        if self._client is None:
+            self._client = as_client(self.llm)
+        return self._client
 
+    @property
+    def extractor_version(self) -> str:
+        """Recorded on each document; reprocessing skips documents already parsed by this version"""
+        return f"prompt-{PROMPT_VERSION}/{self.client.model_name}"
+
+    def _parse_cache_key(self, text: str) -> str:
+        key = f"{PROMPT_VERSION}|{self.client.model_name}|{_normalize_text(text)}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _cache_parsed(self, key: str, parsed: Dict):
+        # Only keep responses that actually yielded fields
+        if parsed.get("vendor_name") or parsed.get("amount"):
+            self.parse_cache.set(key, parsed)
+
+    def _parse_without_llm(self, text: str, key: str) -> Optional[Dict]:
+        """Rule-based fast path, then the parse cache; None means the LLM is needed"""
+        if self.fast_path is not None:
+            parsed = self.fast_path.try_extract(text)
+            if parsed is not None:
+                return parsed
+        return self.parse_cache.get(key)
+
+    @timed("parse")
     def _parse_receipt_text(self, text: str) -> Dict:
-        prompt = PromptTemplate.from_template(self.template)
-        from pydantic import SecretStr
-        llm = ChatGroq(
-            model="llama3-70b-8192",
-            api_key=SecretStr(self.groq_api_key),
-            stop_sequences=[]  # Provide an empty list or appropriate stop sequences
-        )
-        from langchain_core.runnables import RunnableSerializable
-        chain: RunnableSerializable = prompt | llm
-        response = chain.invoke({"text": text})
+        key = self._parse_cache_key(text)
+        parsed = self._parse_without_llm(text, key)
+        if parsed is not None:
+            return parsed
+        with stage_timer("llm"):
+            response = self.client.complete(self.template.format(text=text))
+        parsed = self._parse_response(response)
+        self._cache_parsed(key, parsed)
+        return dict(parsed)
+
+    def parse_batch(self, texts: List[str]) -> List[Union[Dict, Exception]]:
+        """Parse several OCR texts with concurrent LLM calls, packing short ones into shared prompts;
+        failures are returned in place"""
+        results: List[Union[Dict, Exception, None]] = [None] * len(texts)
+        keys = [self._parse_cache_key(text) for text in texts]
+        misses = []
+        for i, key in enumerate(keys):
+            results[i] = self._parse_without_llm(texts[i], key)
+            if results[i] is None:
+                misses.append(i)
+        if not misses:
+            return results
+
+        packs = [
+            [misses[j] for j in pack]
+            for pack in plan_packs(
+                [len(texts[i]) for i in misses], LLM_PACK_MAX_RECEIPTS, LLM_PACK_MAX_CHARS, LLM_PACK_ITEM_MAX_CHARS
+            )
+        ]
+        with stage_timer("llm_batch"):
+            responses = self.client.complete_many([self._batch_prompt([texts[i] for i in pack]) for pack in packs])
+            unanswered = []
+            for pack, response in zip(packs, responses):
+                if len(pack) == 1:
+                    answers = [response]
+                elif isinstance(response, Exception):
+                    answers = [response] * len(pack)
+                else:
+                    # Receipts the model skipped or merged get a call of their own below
+                    answers = split_results(response, len(pack))
+                for i, answer in zip(pack, answers):
+                    if answer is None:
+                        unanswered.append(i)
+                    else:
+                        results[i] = answer
+            if unanswered:
+                retried = self.client.complete_many([self.template.format(text=texts[i]) for i in unanswered])
+                for i, answer in zip(unanswered, retried):
+                    results[i] = answer
+
+        for i in misses:
+            if isinstance(results[i], Exception):
+                continue
+            parsed = self._parse_response(results[i])
+            self._cache_parsed(keys[i], parsed)
+            results[i] = dict(parsed)
+        return results
+
+    def _batch_prompt(self, batch: List[str]) -> str:
+        if len(batch) == 1:
+            return self.template.format(text=batch[0])
+        return PACKED_PROMPT_TEMPLATE.format(count=len(batch), receipts=pack_items(batch))
+
+    def _parse_response(self, response) -> Dict:
         if hasattr(response, "content"):
             response_text = response.content
         else:
@@ -145,5 +986,3 @@ class ReceiptProcessor:
             "category": category.group(1) if category else "",
             "description": description.group(1) if description else ""
         }
-    
-
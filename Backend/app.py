@@ -1,40 +1,107 @@
 # app.py
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from PIL import Image
-from pdf2image import convert_from_bytes
 from fastapi.exceptions import RequestValidationError
-from io import BytesIO
 from fastapi.exception_handlers import request_validation_exception_handler
 import os, logging, uvicorn
 import traceback
-from Extraction import ReceiptProcessor
-from typing import Optional
+from Extraction import ReceiptProcessor, get_ocr_pool, rule_extractor, warm_up_engines, engine_status
+from llm import get_llm_client, llm_client_loaded
+from config import (
+    OCR_WARM_ON_STARTUP,
+    ENGINE_WARMUP_ON_STARTUP,
+    DEDUP_SKIP_DUPLICATES,
+    EXPORT_CHUNK_SIZE,
+    COLUMNAR_BATCH_ROWS,
+    METRICS_ENABLED,
+    REPROCESS_BATCH_SIZE,
+    MAX_UPLOAD_BYTES,
+    MAX_BATCH_UPLOAD_BYTES,
+    MAX_BATCH_FILES,
+)
+from cache import extraction_cache, parse_cache, response_cache
+from blobstore import get_blob_store
+from uploads import SpooledUpload, TooManyFiles, UploadTooLarge, expand_zip, spool_upload
+import json
+import mimetypes
+from datetime import datetime, timezone
+from functools import partial
+import re
+from contextlib import ExitStack
+import threading
+import zipfile
+from typing import Optional, List
 from fastapi import Query
 from fastapi import Body
-from fastapi.responses import StreamingResponse
-import pandas as pd
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from jobs import job_queue, JobStatus
+from export import COLUMNAR_FORMATS, EXPORT_FORMATS, PARTITION_KEYS, columnar_available
+from metrics import (
+    REGISTRY,
+    Gauge,
+    HTTP_REQUEST_SECONDS,
+    HTTP_REQUESTS_IN_FLIGHT,
+    IterTimer,
+    observe_stage,
+)
+import time
 from db import (
     DocumentFilter,
+    SessionLocal,
+    WriteSessionLocal,
     get_db,
-    get_all_documents,
+    get_write_db,
     get_document_by_id,
+    get_document_blob_key,
+    get_document_ocr_text,
+    get_reprocess_batch,
+    count_manually_edited,
+    count_without_ocr_text,
+    update_parsed_fields,
     insert,
-    update_document_by_id,
-    delete_document_by_id,
-    filter_documents
+    bulk_insert,
+    parse_receipt_date,
+    documents_version,
+    has_filtered_documents,
+    has_filters,
+    iter_filtered_documents,
+    iter_export_chunks,
+    export_watermark,
+    vendor_category_map,
+    stats_by_category,
+    stats_by_vendor,
+    stats_by_period
 )
+import db_async
+from db_async import dispose_async_engine, get_async_db, get_async_write_db
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 # import pytesseract
 
 # pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-UPLOAD_FOLDER = "Saved_data"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 app = FastAPI()
 logger = logging.getLogger(__name__)
 
+# Pool and cache state, read when /metrics is scraped
+Gauge("jobs", "Retained background jobs by status.", ["status"]).set_function(job_queue.status_counts)
+Gauge("ocr_readers", "OCR readers in this process by state.", ["state"]).set_function(lambda: get_ocr_pool().stats())
+Gauge("llm_requests_in_flight", "LLM calls currently waiting on the provider.").set_function(
+    lambda: get_llm_client().in_flight if llm_client_loaded() else 0
+)
+_cache_stats = lambda field: lambda: {
+    "dedup": extraction_cache.stats()[field],
+    "parse": parse_cache.stats()[field],
+}
+Gauge("extraction_cache_entries", "Entries in the extraction caches.", ["cache"]).set_function(_cache_stats("entries"))
+Gauge("extraction_cache_hits", "Extraction cache hits since startup.", ["cache"]).set_function(_cache_stats("hits"))
+Gauge("extraction_cache_misses", "Extraction cache misses since startup.", ["cache"]).set_function(_cache_stats("misses"))
+Gauge("response_cache", "Listing/filter response cache state.", ["stat"]).set_function(response_cache.stats)
+
 class DocumentUpdate(BaseModel):
     vendor: str
     date: str
@@ -42,30 +109,61 @@ class DocumentUpdate(BaseModel):
     category: str
     data: str
 
+class DocumentCreate(BaseModel):
+    vendor: str
+    date: str
+    amount: float
+    category: str
+    data: str = ""
+
+class DocumentPatch(BaseModel):
+    vendor: Optional[str] = None
+    date: Optional[str] = None
+    amount: Optional[float] = None
+    category: Optional[str] = None
+
+class BulkUpdate(BaseModel):
+    filters: DocumentFilter = DocumentFilter()
+    values: DocumentPatch
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "X-Export-Watermark"],
 )
 
-def _extract_text(file_bytes: bytes, file_extension: str) -> str:
+def _load_vendor_categories():
+    # Seed the rule-based fast path with vendor -> category pairs already in the database
     try:
-        if file_extension.lower() in ('.jpg', '.jpeg', '.png'):
-            return pytesseract.image_to_string(Image.open(BytesIO(file_bytes)))
-        elif file_extension.lower() == '.pdf':
-            images = convert_from_bytes(file_bytes, poppler_path=r"C:\poppler-23.11.0\Library\bin")
-            return "\n".join(pytesseract.image_to_string(img) for img in images)
-        elif file_extension.lower() == '.txt':
-            return file_bytes.decode('utf-8')
-        else:
-            raise ValueError(f"Unsupported file type: {file_extension}")
+        with SessionLocal() as db:
+            mapping = vendor_category_map(db)
     except Exception as e:
-        logger.error(f"Text extraction failed: {e}")
-        raise
-
-
+        logger.warning(f"Loading vendor categories failed: {e}")
+        mapping = {}
+    rule_extractor.load_vendor_categories(mapping)
+
+def _background_warm_up():
+    _load_vendor_categories()
+    if ENGINE_WARMUP_ON_STARTUP or OCR_WARM_ON_STARTUP:
+        warm_up_engines(ocr_reader=OCR_WARM_ON_STARTUP)
+
+@app.on_event("startup")
+def warm_engines():
+    # Scan the vendor table and import the OCR/PDF/LLM stacks in the background so startup
+    # is not blocked; until the table is loaded the fast path defers receipts to the LLM
+    rule_extractor.begin_loading()
+    threading.Thread(target=_background_warm_up, daemon=True, name="engine-warmup").start()
+
+@app.on_event("shutdown")
+def stop_job_queue():
+    job_queue.shutdown(wait=False)
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    await dispose_async_engine()
 
 # @app.post("/upload")
 # async def upload_file(file: UploadFile = File(...), db: Session = Depends(get_db)):
@@ -92,67 +190,519 @@ def _extract_text(file_bytes: bytes, file_extension: str) -> str:
 #     except Exception as e:
 #         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
-@app.post("/upload")
-async def upload_file(file: UploadFile = File(...), db: Session = Depends(get_db)):
+def _insert_parsed(parsed_data: dict, blob_key: Optional[str] = None) -> int:
+    db = WriteSessionLocal()
     try:
-        file_bytes = await file.read()
-        filename = file.filename
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-
-        with open(file_path, "wb") as buffer:
-            buffer.write(file_bytes)
-
-        _, ext = os.path.splitext(filename)
-
-        # Extract and parse receipt
-        parsed_data = ReceiptProcessor().process_uploaded_file(file_bytes, ext)
-        print("Parsed Data:", parsed_data)
-
-        if not parsed_data:
-            raise HTTPException(status_code=400, detail="Receipt parsing failed.")
-
-        insert(
+        doc = insert(
             db=db,
             vendor=parsed_data["vendor_name"],
-            data=parsed_data["raw_text"],
+            data=parsed_data["description"],
             amount=parsed_data["amount"],
             category=parsed_data["category"],
-            date=parsed_data["date"]
+            date=parsed_data["date"],
+            blob_key=blob_key,
+            ocr_text=parsed_data["raw_text"],
+            extractor_version=parsed_data.get("extractor_version")
         )
-
+        rule_extractor.learn(parsed_data["vendor_name"], parsed_data["category"])
+        return doc.id
+    finally:
+        db.close()
+
+def _process_upload(upload: SpooledUpload) -> dict:
+    """Background job: move the spooled upload into the blob store, then extract, parse and insert it"""
+    filename = upload.filename
+    store = get_blob_store()
+    key = store.put_file(upload.path, upload.extension, digest=upload.digest)
+
+    # Extract and parse receipt straight from the stored file
+    with store.local_path(key) as file_path:
+        text, parsed_data = ReceiptProcessor().process_file_with_text(file_path, upload.extension)
+    logger.debug(f"Parsed data for {filename}: {parsed_data}")
+
+    if not parsed_data:
+        raise ValueError("Receipt parsing failed.")
+
+    doc_id = _insert_parsed(parsed_data, key)
+    # extracted_data["raw_text"] already holds the OCR text
+    extraction_cache.set(upload.digest, {
+        "extracted_data": parsed_data,
+        "document_id": doc_id,
+        "blob_key": key
+    })
+
+    return {
+        "message": f"File '{filename}' uploaded and data inserted.",
+        "id": doc_id,
+        "extracted_data": parsed_data
+    }
+
+def _store_duplicate(upload: SpooledUpload, cached: dict, skip_duplicates: bool) -> dict:
+    """Reuse a previous extraction instead of re-running OCR and the LLM"""
+    try:
+        return _reuse_extraction(upload, cached, skip_duplicates)
+    finally:
+        upload.discard()
+
+def _reuse_extraction(upload: SpooledUpload, cached: dict, skip_duplicates: bool) -> dict:
+    filename = upload.filename
+    parsed_data = dict(cached["extracted_data"])
+    if "ocr_text" in cached:
+        # Older entries kept the OCR text separately and the description in raw_text
+        parsed_data["raw_text"] = cached["ocr_text"]
+    original_id = cached.get("document_id")
+    if skip_duplicates and original_id is not None:
+        db = SessionLocal()
+        try:
+            original_exists = get_document_by_id(db, original_id) is not None
+        finally:
+            db.close()
+        if original_exists:
+            return {
+                "message": f"File '{filename}' is a duplicate; no new document inserted.",
+                "duplicate": True,
+                "id": original_id,
+                "extracted_data": parsed_data
+            }
+    return {
+        "message": f"File '{filename}' matched a previous upload and data inserted.",
+        "duplicate": True,
+        # Entries cached before the blob store existed have no original stored yet
+        "id": _insert_parsed(
+            parsed_data,
+            cached.get("blob_key") or get_blob_store().put_file(upload.path, upload.extension, digest=upload.digest)
+        ),
+        "duplicate_of": original_id,
+        "extracted_data": parsed_data
+    }
+
+@app.post("/upload", status_code=202)
+async def upload_file(
+    response: Response,
+    file: UploadFile = File(...),
+    skip_duplicates: bool = Query(DEDUP_SKIP_DUPLICATES)
+):
+    upload = None
+    try:
+        # Stream to a temp file next to the blob store, hashing on the way; memory stays at one chunk
+        upload = await spool_upload(file, get_blob_store().spool_dir, run_sync=run_in_threadpool)
+        filename = upload.filename
+
+        cached = await run_in_threadpool(extraction_cache.get, upload.digest)
+        if cached is not None:
+            response.status_code = 200
+            return await run_in_threadpool(_store_duplicate, upload, cached, skip_duplicates)
+
+        # The job moves the spooled file into the blob store and processes it from there
+        job_id = job_queue.submit(_process_upload, upload, kind="upload")
+        upload = None
         return {
-            "message": f"File '{filename}' uploaded and data inserted.",
-            "extracted_data": parsed_data
+            "message": f"File '{filename}' uploaded and queued for processing.",
+            "job_id": job_id,
+            "status": JobStatus.QUEUED,
+            "status_url": f"/jobs/{job_id}"
         }
 
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
-        print("❌ Exception Occurred:")
-        traceback.print_exc()  # <-- PRINTS the complete traceback in terminal
+        logger.exception("Upload failed")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+    finally:
+        # None once a job owns the file; otherwise nothing else will clean it up
+        if upload is not None:
+            upload.discard()
+
+def _process_batch(uploads: List[SpooledUpload]) -> dict:
+    """Background job: store originals, OCR them in parallel, batch the LLM calls and insert in one transaction"""
+    store = get_blob_store()
+    results = [{"filename": upload.filename, "status": "failed"} for upload in uploads]
+    try:
+        keys = [store.put_file(upload.path, upload.extension, digest=upload.digest) for upload in uploads]
+    finally:
+        for upload in uploads:
+            upload.discard()
+    with ExitStack() as stack:
+        parsed = ReceiptProcessor().process_batch([stack.enter_context(store.local_path(key)) for key in keys])
+
+    rows, row_indexes = [], []
+    for i, parsed_data in enumerate(parsed):
+        if isinstance(parsed_data, Exception):
+            results[i]["error"] = str(parsed_data)
+            continue
+        try:
+            parse_receipt_date(parsed_data["date"])
+        except ValueError as e:
+            results[i]["error"] = f"Invalid date: {e}"
+            continue
+        results[i]["extracted_data"] = parsed_data
+        rows.append({
+            "vendor": parsed_data["vendor_name"],
+            "data": parsed_data["description"],
+            "amount": parsed_data["amount"],
+            "category": parsed_data["category"],
+            "date": parsed_data["date"],
+            "blob_key": keys[i],
+            "ocr_text": parsed_data["raw_text"],
+            "extractor_version": parsed_data["extractor_version"]
+        })
+        row_indexes.append(i)
+
+    if rows:
+        db = WriteSessionLocal()
+        try:
+            ids = bulk_insert(db, rows)
+            for i, doc_id in zip(row_indexes, ids):
+                results[i].update(status="succeeded", id=doc_id)
+                rule_extractor.learn(results[i]["extracted_data"]["vendor_name"], results[i]["extracted_data"]["category"])
+        except Exception as e:
+            logger.error(f"Batch insert failed: {e}")
+            for i in row_indexes:
+                results[i]["error"] = f"Insert failed: {e}"
+        finally:
+            db.close()
+
+    succeeded = sum(1 for result in results if result["status"] == "succeeded")
+    return {
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results
+    }
+
+@app.post("/upload/batch", status_code=202)
+async def upload_batch(files: List[UploadFile] = File(...)):
+    uploads: List[SpooledUpload] = []
+    submitted = False
+    try:
+        spool_dir = get_blob_store().spool_dir
+        # Zips count with their expanded members, so a small archive cannot get around the limits
+        total = 0
+        for file in files:
+            upload = await spool_upload(file, spool_dir, run_sync=run_in_threadpool)
+            if upload.extension == ".zip":
+                members = await run_in_threadpool(
+                    expand_zip, upload, spool_dir, MAX_UPLOAD_BYTES,
+                    max(0, MAX_BATCH_UPLOAD_BYTES - total), max(0, MAX_BATCH_FILES - len(uploads))
+                )
+                uploads.extend(members)
+                total += sum(member.size for member in members)
+            else:
+                uploads.append(upload)
+                total += upload.size
+            if total > MAX_BATCH_UPLOAD_BYTES:
+                raise HTTPException(
+                    status_code=413, detail=f"Batch is larger than the {MAX_BATCH_UPLOAD_BYTES // (1024 * 1024)} MB limit"
+                )
+            if len(uploads) > MAX_BATCH_FILES:
+                raise HTTPException(status_code=413, detail=f"Batch holds more than {MAX_BATCH_FILES} files")
+
+        if not uploads:
+            raise HTTPException(status_code=400, detail="No files to process.")
+
+        job_id = job_queue.submit(_process_batch, uploads, kind="batch")
+        submitted = True
+        return {
+            "message": f"{len(uploads)} file(s) uploaded and queued for processing.",
+            "job_id": job_id,
+            "status": JobStatus.QUEUED,
+            "status_url": f"/jobs/{job_id}"
+        }
 
+    except HTTPException:
+        raise
+    except (UploadTooLarge, TooManyFiles) as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except zipfile.BadZipFile as e:
+        raise HTTPException(status_code=400, detail=f"Invalid zip archive: {str(e)}")
+    except Exception as e:
+        logger.exception("Batch upload failed")
+        raise HTTPException(status_code=500, detail=f"Batch upload failed: {str(e)}")
+    finally:
+        # Once submitted, the job owns the files
+        if not submitted:
+            for upload in uploads:
+                upload.discard()
+
+def _reprocess_documents(filters: DocumentFilter, force: bool) -> dict:
+    """Background job: re-parse stored OCR text with the current extractor and overwrite the parsed fields.
+    Only the parse stage (rules/cache/LLM) runs; documents without stored OCR text are skipped, never re-OCRed."""
+    processor = ReceiptProcessor()
+    version = processor.extractor_version
+    summary = {"extractor_version": version, "processed": 0, "updated": 0, "failed": 0, "errors": []}
+    with SessionLocal() as db:
+        summary["skipped_no_ocr_text"] = count_without_ocr_text(db, filters)
+        summary["skipped_manual_edits"] = 0 if force else count_manually_edited(db, filters)
+    last_id = 0
+    while True:
+        # A short read transaction per round, so SQLite can checkpoint while the job runs
+        with SessionLocal() as db:
+            batch = get_reprocess_batch(db, filters, None if force else version, last_id, REPROCESS_BATCH_SIZE)
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        updates = []
+        for (doc_id, _), parsed_data in zip(batch, processor.parse_batch([text for _, text in batch])):
+            try:
+                if isinstance(parsed_data, Exception):
+                    raise parsed_data
+                parse_receipt_date(parsed_data["date"])
+            except Exception as e:
+                summary["failed"] += 1
+                if len(summary["errors"]) < 20:
+                    summary["errors"].append({"id": doc_id, "error": str(e)})
+                continue
+            updates.append({
+                "id": doc_id,
+                "vendor": parsed_data["vendor_name"],
+                "amount": parsed_data["amount"],
+                "category": parsed_data["category"],
+                "date": parsed_data["date"],
+                "data": parsed_data["description"],
+                "extractor_version": version
+            })
+        with WriteSessionLocal() as db:
+            summary["updated"] += update_parsed_fields(db, updates)
+        summary["processed"] += len(batch)
+    return summary
+
+@app.post("/documents/reprocess", status_code=202)
+def reprocess_documents(
+    filters: DocumentFilter = Body(default={}),
+    force: bool = Query(False, description="Also re-parse documents already parsed by the current extractor version or edited by hand")
+):
+    """Queue a re-parse of the matching documents from their stored OCR text"""
+    job_id = job_queue.submit(_reprocess_documents, filters, force, kind="reprocess")
+    return {
+        "message": "Reprocessing queued.",
+        "job_id": job_id,
+        "status": JobStatus.QUEUED,
+        "status_url": f"/jobs/{job_id}"
+    }
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+# Multipart framing around the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+UPLOAD_LIMITS = {"/upload": MAX_UPLOAD_BYTES, "/upload/batch": MAX_BATCH_UPLOAD_BYTES}
+
+@app.middleware("http")
+async def reject_oversized_uploads(request, call_next):
+    # Refuse bodies declared too large before they are parsed and spooled; chunked
+    # bodies without a Content-Length are still capped file by file while spooling
+    limit = UPLOAD_LIMITS.get(request.url.path)
+    length = request.headers.get("content-length")
+    if limit is not None and length and length.isdigit() and int(length) > limit + MULTIPART_OVERHEAD_BYTES:
+        return JSONResponse(status_code=413, content={"detail": f"Upload is larger than the {limit // (1024 * 1024)} MB limit"})
+    return await call_next(request)
+
+if METRICS_ENABLED:
+    @app.middleware("http")
+    async def record_request_metrics(request, call_next):
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            # Label by route template, not the raw path, to keep cardinality bounded
+            route = request.scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                method=request.method,
+                route=getattr(route, "path", "unmatched"),
+                status=status,
+            )
+
+@app.get("/metrics")
+def metrics():
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/ready")
+def ready(
+    response: Response,
+    require: Optional[str] = Query(None, description="Comma-separated engines that must be warm, e.g. ocr,llm")
+):
+    """Readiness probe: the database must answer; `require` also gates on warm engines"""
+    engines = engine_status()
+    try:
+        with SessionLocal() as db:
+            db.execute(text("SELECT 1"))
+        database = True
+    except Exception as e:
+        logger.warning(f"Readiness check could not reach the database: {e}")
+        database = False
+    missing = [name.strip() for name in (require or "").split(",") if name.strip() and not engines.get(name.strip())]
+    is_ready = database and not missing
+    if not is_ready:
+        response.status_code = 503
+    return {"ready": is_ready, "database": database, "engines": engines, "missing": missing}
+
+@app.get("/extraction/stats")
+def extraction_stats():
+    return {
+        "dedup_cache": extraction_cache.stats(),
+        "parse_cache": parse_cache.stats(),
+        "fast_path": rule_extractor.stats()
+    }
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in tags)
+
+async def _cached_json(request: Request, key: tuple, build) -> Response:
+    """Serve a JSON body from the response cache, answering 304 when the client already has it.
+
+    `key` must include documents_version(), read before `build` runs, so entries
+    computed from pre-write data are never served after a write. `build()` returns
+    (data, extra headers) when awaited; errors it raises propagate and are never cached.
+    """
+    entry = response_cache.get(key)
+    if entry is None:
+        data, headers = await build()
+        entry = response_cache.set(key, json.dumps(jsonable_encoder(data)).encode(), headers)
+    # no-cache: browsers may keep the body but must revalidate with If-None-Match
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache", **entry.headers}
+    if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
 
 @app.get("/documents")
-def read_documents(
+async def read_documents(
+    request: Request,
     offset: int = Query(0, ge=0),
     limit: int = Query(50, le=1000),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None),
+    db=Depends(get_async_db)
 ):
-    return get_all_documents(db, offset, limit)
+    async def build():
+        if cursor is None:
+            return await db_async.get_all_documents(db, offset, limit), {}
+        docs, next_cursor = await db_async.get_documents_page(db, cursor, limit)
+        # Keep the body a plain list for existing clients; the cursor travels in a header
+        return docs, ({"X-Next-Cursor": next_cursor} if next_cursor else {})
+
+    try:
+        return await _cached_json(request, ("documents", offset, limit, cursor, documents_version()), build)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/documents/bulk")
+async def bulk_create_documents(docs: List[DocumentCreate], db=Depends(get_async_write_db)):
+    rows = [doc.model_dump() for doc in docs]
+    try:
+        for row in rows:
+            parse_receipt_date(row["date"])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {e}")
+    ids = await db_async.bulk_insert(db, rows)
+    for pair in {(row["vendor"], row["category"]) for row in rows}:
+        rule_extractor.learn(*pair)
+    return {"inserted": len(ids), "ids": ids}
+
+@app.patch("/documents/bulk")
+async def bulk_update_documents(
+    update: BulkUpdate,
+    update_all: bool = Query(False, alias="all", description="required to update every document when no filter is given"),
+    db=Depends(get_async_write_db)
+):
+    values = update.values.model_dump(exclude_unset=True)
+    if not values:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    # An empty filter matches the whole table; make callers say so explicitly
+    if not has_filters(update.filters) and not update_all:
+        raise HTTPException(status_code=400, detail="No filter given; pass ?all=true to update every document")
+    try:
+        updated = await db_async.bulk_update(db, update.filters, values)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"updated": updated}
 
 @app.get("/documents/{doc_id}")
-def fetch_document(doc_id: int, db: Session = Depends(get_db)):
-    doc = get_document_by_id(db, doc_id)
+async def fetch_document(doc_id: int, db=Depends(get_async_db)):
+    doc = await db_async.get_document_by_id(db, doc_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     return doc
 
+@app.get("/documents/{doc_id}/text")
+def fetch_document_text(doc_id: int, db: Session = Depends(get_db)):
+    """Stored OCR text of a document and the extractor version that parsed it"""
+    result = get_document_ocr_text(db, doc_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return result
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def _byte_range(header: Optional[str], size: int) -> Optional[tuple]:
+    """(start, end) inclusive for a single-range Range header, None to send the whole file"""
+    match = RANGE_PATTERN.match(header.strip()) if header else None
+    if not match or match.group(1) == match.group(2) == "":
+        # Absent, malformed or multi-range: the whole file is a valid answer
+        return None
+    first, last = match.groups()
+    if first == "":
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Requested range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+@app.get("/documents/{doc_id}/file")
+def download_document_file(doc_id: int, request: Request, db: Session = Depends(get_db)):
+    """Stream the original upload; supports single byte ranges for previews and resumed downloads"""
+    try:
+        key = get_document_blob_key(db, doc_id)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Document not found")
+    store = get_blob_store()
+    if not key or not store.exists(key):
+        raise HTTPException(status_code=404, detail="No original file stored for this document")
+    size = store.size(key)
+    byte_range = _byte_range(request.headers.get("range"), size)
+    start, end = byte_range or (0, size - 1)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(end - start + 1),
+        "Content-Disposition": f'inline; filename="document-{doc_id}{os.path.splitext(key)[1]}"',
+        # Blobs are immutable, so the content address is a perfect validator
+        "ETag": f'"{key}"',
+    }
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return StreamingResponse(
+        store.iter_range(key, start, end) if size else iter(()),
+        status_code=206 if byte_range else 200,
+        media_type=mimetypes.guess_type(key)[0] or "application/octet-stream",
+        headers=headers,
+    )
+
 @app.put("/documents/{doc_id}")
-def update_document(doc_id: int, updated_doc: DocumentUpdate, db: Session = Depends(get_db)):
-    return update_document_by_id(db, doc_id, updated_doc)
+async def update_document(doc_id: int, updated_doc: DocumentUpdate, db=Depends(get_async_write_db)):
+    result = await db_async.update_document_by_id(db, doc_id, updated_doc)
+    if "error" not in result:
+        # Manual corrections are the best signal for the vendor -> category table
+        rule_extractor.learn(updated_doc.vendor, updated_doc.category)
+    return result
 
 @app.delete("/documents/{doc_id}")
-def delete_document(doc_id: int, db: Session = Depends(get_db)):
-    result = delete_document_by_id(db, doc_id)
+async def delete_document(doc_id: int, db=Depends(get_async_write_db)):
+    result = await db_async.delete_document_by_id(db, doc_id)
     if "error" in result:
         raise HTTPException(status_code=404, detail=result["error"])
     return result
@@ -201,60 +751,150 @@ async def validation_exception_handler(request, exc):
     return await request_validation_exception_handler(request, exc)
 
 @app.post("/filter_documents")
-def filter_documents_endpoint(
+async def filter_documents_endpoint(
+    request: Request,
     filters: DocumentFilter = Body(default={}),
     offset: int = Query(0),
     limit: int = Query(20),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None),
+    include_total: bool = Query(True),
+    db=Depends(get_async_db)
 ):
+    key = ("filter", filters.model_dump_json(), offset, limit, cursor, include_total, documents_version())
     try:
-        print(filters)
-        return filter_documents(db, filters, offset, limit)
+        async def build():
+            return await db_async.filter_documents(db, filters, offset, limit, cursor, include_total), {}
+        return await _cached_json(request, key, build)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Filtering failed: {str(e)}")
 
-@app.post("/download")
-def download_filtered_data(
+@app.post("/stats")
+def dashboard_stats(
     filters: DocumentFilter = Body(default={}),
-    format: str = Query("csv"),
+    period: str = Query("month"),
+    top_vendors: int = Query(10, ge=1, le=100),
     db: Session = Depends(get_db)
 ):
     try:
-        data = filter_documents(db, filters)
+        return {
+            "by_category": stats_by_category(db, filters),
+            "by_vendor": stats_by_vendor(db, filters, top_vendors),
+            "by_period": stats_by_period(db, filters, period)
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        results = data.get("results", [])
-        if not results:
-            raise HTTPException(status_code=404, detail="No data found")
+@app.post("/stats/categories")
+def category_stats(filters: DocumentFilter = Body(default={}), db: Session = Depends(get_db)):
+    return stats_by_category(db, filters)
 
-        df = pd.DataFrame([{k: v for k, v in item.items() if k != "id"} for item in results])
+@app.post("/stats/vendors")
+def vendor_stats(
+    filters: DocumentFilter = Body(default={}),
+    limit: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_db)
+):
+    return stats_by_vendor(db, filters, limit)
 
-        if format == "csv":
-            stream = BytesIO()
-            df.to_csv(stream, index=False)
-            stream.seek(0)
-            return StreamingResponse(stream, media_type="text/csv", headers={
-                "Content-Disposition": "attachment; filename=filtered_receipts.csv"
-            })
+@app.post("/stats/periods")
+def period_stats(
+    filters: DocumentFilter = Body(default={}),
+    period: str = Query("month"),
+    db: Session = Depends(get_db)
+):
+    try:
+        return stats_by_period(db, filters, period)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        elif format == "json":
-            json_bytes = BytesIO()
-            json_bytes.write(df.to_json(orient="records").encode("utf-8"))
-            json_bytes.seek(0)
-            return StreamingResponse(json_bytes, media_type="application/json", headers={
-                "Content-Disposition": "attachment; filename=filtered_receipts.json"
-            })
+def _export_rows(filters: DocumentFilter):
+    # The streaming body outlives the request's session, so it reads through its own
+    db = SessionLocal()
+    try:
+        yield from iter_filtered_documents(db, filters, EXPORT_CHUNK_SIZE)
+    finally:
+        db.close()
 
-        elif format == "excel":
-            excel_stream = BytesIO()
-            df.to_excel(excel_stream, index=False)
-            excel_stream.seek(0)
-            return StreamingResponse(excel_stream, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", headers={
-                "Content-Disposition": "attachment; filename=filtered_receipts.xlsx"
-            })
+def _export_chunks(filters: DocumentFilter, since: Optional[datetime], until: datetime):
+    db = SessionLocal()
+    try:
+        yield from iter_export_chunks(db, filters, COLUMNAR_BATCH_ROWS, since, until)
+    finally:
+        db.close()
+
+def _timed_export(encoder, source):
+    """Stream an export, recording database fetch and encoding time separately"""
+    rows = IterTimer(source)
+    encoded = encoder(rows)
+    chunks = IterTimer(encoded)
+    try:
+        yield from chunks
+    finally:
+        encoded.close()
+        source.close()
+        observe_stage("export_fetch", rows.seconds)
+        observe_stage("export_encode", chunks.seconds - rows.seconds)
+
+def _columnar_download(db: Session, filters: DocumentFilter, format: str, partition_by: Optional[str],
+                       since: Optional[datetime]) -> Response:
+    """Parquet/Arrow export, bounded by a watermark the client passes back as `since` for the next increment"""
+    if not columnar_available():
+        raise HTTPException(status_code=501, detail=f"{format} exports need pyarrow installed on the server")
+    if partition_by is not None and partition_by not in PARTITION_KEYS:
+        raise HTTPException(status_code=400, detail=f"partition_by must be one of: {', '.join(PARTITION_KEYS)}")
+    if since is not None and since.tzinfo is not None:
+        # updated_at is stored as naive UTC
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+
+    watermark = export_watermark(db, filters, since)
+    if watermark is None:
+        if since is not None:
+            # Nothing changed: the client keeps its watermark
+            return Response(status_code=204, headers={"X-Export-Watermark": since.isoformat()})
+        raise HTTPException(status_code=404, detail="No data found")
+
+    encoder, media_type, extension = COLUMNAR_FORMATS[format]
+    if partition_by:
+        media_type, extension = "application/zip", f"{extension}.zip"
+    return StreamingResponse(
+        _timed_export(partial(encoder, partition_by=partition_by), _export_chunks(filters, since, watermark)),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename=filtered_receipts.{extension}",
+            "X-Export-Watermark": watermark.isoformat(),
+        },
+    )
+
+@app.post("/download")
+def download_filtered_data(
+    filters: DocumentFilter = Body(default={}),
+    format: str = Query("csv"),
+    partition_by: Optional[str] = Query(None, description="parquet/arrow only: 'month' for a zip of monthly files"),
+    since: Optional[datetime] = Query(None, description="parquet/arrow only: rows changed after this watermark"),
+    db: Session = Depends(get_db)
+):
+    try:
+        if format in COLUMNAR_FORMATS:
+            return _columnar_download(db, filters, format, partition_by, since)
 
-        else:
+        if format not in EXPORT_FORMATS:
             raise HTTPException(status_code=400, detail="Invalid format")
 
+        if partition_by is not None or since is not None:
+            raise HTTPException(status_code=400, detail="partition_by and since apply to parquet and arrow exports only")
+
+        if not has_filtered_documents(db, filters):
+            raise HTTPException(status_code=404, detail="No data found")
+
+        encoder, media_type, extension = EXPORT_FORMATS[format]
+        return StreamingResponse(_timed_export(encoder, _export_rows(filters)), media_type=media_type, headers={
+            "Content-Disposition": f"attachment; filename=filtered_receipts.{extension}"
+        })
+
+    except HTTPException:
+        raise
     except Exception as e:
         tb = traceback.format_exc()
         logging.error(f"Download failed with error: {str(e)}\nTraceback:\n{tb}")
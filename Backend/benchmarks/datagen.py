@@ -0,0 +1,79 @@
+# datagen.py
+"""Fill the `documents` table with synthetic rows for query benchmarks.
+
+Usage (from Backend/):
+    DATABASE_URL=sqlite:///./bench.db python benchmarks/datagen.py --rows 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CATEGORIES = ["Food", "Transport", "Utilities", "Entertainment", "Shopping", "Health", "Other"]
+WORDS = ["fresh", "city", "metro", "green", "golden", "royal", "urban", "star", "blue", "prime",
+         "corner", "market", "cafe", "pharmacy", "fuel", "cinema", "outlet", "bakery", "store", "hub"]
+
+
+def vendor_names(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < count:
+        names.add(" ".join(rng.sample(WORDS, 2)).title() + f" {rng.randrange(100)}")
+    return sorted(names)
+
+
+def generate_rows(count: int, seed: int = 0, vendors: int = 2000, days: int = 1095):
+    """Yield insert-ready row dicts with skewed vendor popularity, like real spending"""
+    rng = random.Random(seed)
+    names = vendor_names(vendors, seed)
+    vendor_category = {name: rng.choice(CATEGORIES) for name in names}
+    start = date.today() - timedelta(days=days)
+    for _ in range(count):
+        vendor = names[min(int(rng.paretovariate(1.2)) - 1, vendors - 1)] if rng.random() < 0.7 else rng.choice(names)
+        yield {
+            "vendor": vendor,
+            "date": (start + timedelta(days=rng.randrange(days))).isoformat(),
+            "amount": round(rng.lognormvariate(3, 1), 2),
+            "category": vendor_category[vendor],
+            "data": f"Purchase at {vendor}",
+        }
+
+
+def fill_documents(target_rows: int, seed: int = 0, chunk_size: int = 50000) -> dict:
+    """Top the table up to `target_rows` rows; returns counts and insert throughput"""
+    from db import Document, SessionLocal, WriteSessionLocal, bulk_insert
+
+    with SessionLocal() as db:
+        existing = db.query(Document.id).count()
+    missing = max(0, target_rows - existing)
+    rows = generate_rows(missing, seed + existing)
+    start = time.perf_counter()
+    inserted = 0
+    while inserted < missing:
+        chunk = [next(rows) for _ in range(min(chunk_size, missing - inserted))]
+        with WriteSessionLocal() as db:
+            bulk_insert(db, chunk)
+        inserted += len(chunk)
+    elapsed = time.perf_counter() - start
+    return {
+        "existing_rows": existing,
+        "inserted_rows": inserted,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(inserted / elapsed, 1) if inserted else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(fill_documents(args.rows, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# preprocess_bench.py
+"""Compare OCR input size, OCR time and accuracy across preprocessing profiles.
+
+Usage (from Backend/):
+    python benchmarks/preprocess_bench.py                      # synthetic 12MP phone photos
+    python benchmarks/preprocess_bench.py photo1.jpg photo2.jpg  # real images; photo1.txt holds the expected text
+    python benchmarks/preprocess_bench.py --no-ocr --profiles off balanced
+
+Prints one JSON document with per-profile medians.
+"""
+import argparse
+import difflib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Extraction import PREPROCESS_PROFILES, get_ocr_pool, preprocess_image  # noqa: E402
+from synthetic import SAMPLE_LINES, receipt_image  # noqa: E402
+
+
+def _load_inputs(paths, tmp_dir):
+    if paths:
+        for path in paths:
+            truth_path = os.path.splitext(path)[0] + ".txt"
+            truth = open(truth_path, encoding="utf-8").read() if os.path.exists(truth_path) else None
+            yield path, truth
+        return
+    for seed in range(3):
+        photo, exif = receipt_image(skew=3.0 + seed)
+        path = os.path.join(tmp_dir, f"synthetic_{seed}.jpg")
+        photo.save(path, quality=90, exif=exif)
+        yield path, "\n".join(SAMPLE_LINES)
+
+
+def _accuracy(text: str, truth: str) -> float:
+    normalize = lambda value: " ".join(value.lower().split())
+    return round(difflib.SequenceMatcher(None, normalize(text), normalize(truth)).ratio(), 4)
+
+
+def run(paths, profiles, repeat: int, ocr: bool) -> dict:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        inputs = list(_load_inputs(paths, tmp_dir))
+        results = {}
+        reader_ctx = get_ocr_pool().reader() if ocr else None
+        reader = reader_ctx.__enter__() if reader_ctx else None
+        try:
+            for name in profiles:
+                rows = []
+                for path, truth in inputs:
+                    timings = []
+                    for _ in range(repeat):
+                        with Image.open(path) as image:
+                            image.load()
+                            input_pixels = image.width * image.height
+                            start = time.perf_counter()
+                            processed = preprocess_image(image, name)
+                            timings.append(time.perf_counter() - start)
+                    row = {
+                        "input": os.path.basename(path),
+                        "input_pixels": input_pixels,
+                        "output_pixels": processed.width * processed.height,
+                        "preprocess_ms": round(statistics.median(timings) * 1000, 1),
+                    }
+                    if reader is not None:
+                        start = time.perf_counter()
+                        text = "\n".join(reader.readtext(np.array(processed), detail=0, paragraph=True))
+                        row["ocr_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                        if truth:
+                            row["accuracy"] = _accuracy(text, truth)
+                    rows.append(row)
+                summary = {
+                    key: statistics.median(row[key] for row in rows)
+                    for key in ("output_pixels", "preprocess_ms", "ocr_ms", "accuracy")
+                    if all(key in row for row in rows)
+                }
+                results[name] = {"median": summary, "files": rows}
+        finally:
+            if reader_ctx:
+                reader_ctx.__exit__(None, None, None)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*")
+    parser.add_argument("--profiles", nargs="+", default=list(PREPROCESS_PROFILES), choices=list(PREPROCESS_PROFILES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-ocr", action="store_true", help="only measure preprocessing and pixel counts")
+    args = parser.parse_args()
+    print(json.dumps(run(args.images, args.profiles, args.repeat, not args.no_ocr), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+# run.py
+"""End-to-end benchmarks for the ingestion and query paths.
+
+Scenarios:
+    ingest    ReceiptProcessor.process_uploaded_file per file kind (txt, text-layer PDF, photo, scanned PDF)
+              against the offline LocalBackend LLM with configurable latency
+    filter    filter_documents for common filter shapes, first page and a cursor page
+    download  POST /download for each export format over the full table
+
+Usage (from Backend/):
+    python benchmarks/run.py --rows 100000 --output results.json
+    python benchmarks/run.py --scenarios filter download --rows 1000000 --database ./bench_1m.db
+
+The database defaults to a throwaway SQLite file so the real one is never touched.
+Results are one JSON document (p50/p95/p99 latency, throughput, peak RSS per stage);
+diff two runs to spot regressions.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+SCENARIOS = ("ingest", "filter", "download")
+
+
+def _rss_mb() -> float:
+    """Current resident set size; falls back to the lifetime peak where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+class RSSSampler:
+    """Track peak RSS while a stage runs by sampling from a background thread"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.start_mb = self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, _rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.start_mb = self.peak_mb = _rss_mb()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, _rss_mb())
+
+
+def summarize(timings, wall_seconds: float, rss: RSSSampler, **extra) -> dict:
+    ms = np.array(timings) * 1000
+    return {
+        "count": len(timings),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "mean_ms": round(float(ms.mean()), 2),
+        "max_ms": round(float(ms.max()), 2),
+        "throughput_per_s": round(len(timings) / wall_seconds, 2) if wall_seconds else None,
+        "peak_rss_mb": round(rss.peak_mb, 1),
+        "rss_growth_mb": round(rss.peak_mb - rss.start_mb, 1),
+        **extra,
+    }
+
+
+def measure(fn, iterations: int, warmup: int = 1, **extra) -> dict:
+    """Time `fn(i)` for each iteration; an int returned by `fn` counts as bytes produced"""
+    for i in range(warmup):
+        fn(-1 - i)
+    timings, produced = [], 0
+    with RSSSampler() as rss:
+        wall = time.perf_counter()
+        for i in range(iterations):
+            start = time.perf_counter()
+            result = fn(i)
+            timings.append(time.perf_counter() - start)
+            if isinstance(result, int):
+                produced += result
+        wall = time.perf_counter() - wall
+    if produced:
+        extra["mb_per_s"] = round(produced / 2**20 / wall, 2)
+    return summarize(timings, wall, rss, **extra)
+
+
+def bench_ingest(args, tmp_dir: str) -> dict:
+    from cache import PersistentCache
+    from Extraction import ReceiptProcessor, rule_extractor
+    from llm import LLMClient, LocalBackend
+    from synthetic import RECEIPT_KINDS, make_receipt
+
+    llm = LocalBackend(latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms, seed=args.seed)
+    # A private parse cache; distinct seeds per iteration keep every call a cache miss
+    cache = PersistentCache(os.path.join(tmp_dir, "bench_cache.db"), "bench_parse", 10**6)
+    # No rate limit: the benchmark measures our own overhead, not the provider's quota
+    processor = ReceiptProcessor(llm=LLMClient(llm, rate_per_minute=0), cache=cache, fast_path=rule_extractor if args.fast_path else None)
+    results = {}
+    for kind in RECEIPT_KINDS:
+        samples = {}
+
+        def run(i, kind=kind, samples=samples):
+            # Files are generated outside the timed call
+            data, extension, truth = samples[i]
+            parsed = processor.process_uploaded_file(data, extension)
+            samples["correct"] = samples.get("correct", 0) + (abs(parsed["amount"] - truth["amount"]) < 0.01)
+
+        seeds = range(-1, args.iterations)
+        for i in seeds:
+            samples[i] = make_receipt(kind, args.seed * 100000 + 1000 * RECEIPT_KINDS.index(kind) + i + 1)
+        calls_before = llm.calls
+        try:
+            result = measure(run, args.iterations)
+        except Exception as e:
+            # Image kinds need EasyOCR and poppler; report instead of failing the whole run
+            results[kind] = {"skipped": f"{type(e).__name__}: {e}"}
+            continue
+        result["llm_calls"] = llm.calls - calls_before
+        result["amount_accuracy"] = round(samples.get("correct", 0) / (args.iterations + 1), 3)
+        result["input_kb_mean"] = round(np.mean([len(samples[i][0]) for i in seeds]) / 1024, 1)
+        results[kind] = result
+    return results
+
+
+FILTER_SHAPES = {
+    "unfiltered": {},
+    "vendor_prefix": {"vendor": "fresh"},
+    "category": {"category": "food"},
+    "date_range": {"startDate": "{month_ago}", "endDate": "{today}"},
+    "amount_range": {"minAmount": 10, "maxAmount": 50},
+    "combined": {"category": "food", "startDate": "{year_ago}", "minAmount": 5},
+    "search": {"q": "market"},
+}
+
+
+def _filter_shapes():
+    from datetime import date, timedelta
+    today = date.today()
+    values = {
+        "{today}": today.isoformat(),
+        "{month_ago}": (today - timedelta(days=30)).isoformat(),
+        "{year_ago}": (today - timedelta(days=365)).isoformat(),
+    }
+    return {
+        name: {key: values.get(value, value) if isinstance(value, str) else value for key, value in shape.items()}
+        for name, shape in FILTER_SHAPES.items()
+    }
+
+
+def bench_filter(args) -> dict:
+    from db import DocumentFilter, SessionLocal, _count_cache, explain_filter_plan, filter_documents
+
+    def first_page(filters):
+        # Drop cached COUNT(*)s so every iteration pays for the total, as a fresh filter would
+        _count_cache.clear()
+        return filter_documents(db, filters, 0, args.page_size)
+
+    results = {}
+    with SessionLocal() as db:
+        for name, shape in _filter_shapes().items():
+            filters = DocumentFilter(**shape)
+            first = filter_documents(db, filters, 0, args.page_size)
+            cursor = first.get("next_cursor")
+            results[name] = {
+                "filters": shape,
+                "total": first.get("total"),
+                "plan": explain_filter_plan(db, filters, args.page_size),
+                "first_page": measure(lambda i: first_page(filters), args.iterations),
+                "first_page_no_total": measure(
+                    lambda i: filter_documents(db, filters, 0, args.page_size, include_total=False), args.iterations
+                ),
+            }
+            if cursor:
+                results[name]["cursor_page"] = measure(
+                    lambda i: filter_documents(db, filters, 0, args.page_size, cursor=cursor, include_total=False),
+                    args.iterations,
+                )
+    return results
+
+
+def bench_download(args) -> dict:
+    from fastapi.testclient import TestClient
+    from app import app
+    from export import COLUMNAR_FORMATS, EXPORT_FORMATS, columnar_available
+
+    client = TestClient(app)
+    results = {}
+    # Parquet/Arrow only when pyarrow is installed; the month-partitioned zip is timed too
+    formats = list(EXPORT_FORMATS)
+    if columnar_available():
+        formats += list(COLUMNAR_FORMATS) + [f"{fmt}&partition_by=month" for fmt in COLUMNAR_FORMATS]
+    for fmt in formats:
+        sizes = []
+
+        def run(i, fmt=fmt):
+            size = 0
+            with client.stream("POST", f"/download?format={fmt}", json={}) as response:
+                response.raise_for_status()
+                for chunk in response.iter_bytes():
+                    size += len(chunk)
+            sizes.append(size)
+            return size
+
+        results[fmt] = measure(run, args.download_iterations, warmup=0)
+        results[fmt]["bytes"] = sizes[-1]
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=SCENARIOS)
+    parser.add_argument("--rows", type=int, default=10000, help="documents table size for filter/download (e.g. 10000, 100000, 1000000)")
+    parser.add_argument("--database", help="SQLite file to use/reuse (default: a temporary file)")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--download-iterations", type=int, default=3)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--fast-path", action="store_true", help="let the rule-based extractor skip the LLM")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Configuration is read at import time, so point the app at scratch storage first
+        database = os.path.abspath(args.database or os.path.join(tmp_dir, "bench.db"))
+        os.environ["DATABASE_URL"] = f"sqlite:///{database}"
+        os.environ["CACHE_DB_PATH"] = os.path.join(tmp_dir, "cache.db")
+        os.environ.setdefault("SQL_ECHO", "false")
+
+        from datagen import fill_documents
+
+        report = {
+            "meta": {
+                "started_at": datetime.utcnow().isoformat() + "Z",
+                "git_revision": _git_revision(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "args": vars(args),
+            },
+            "results": {},
+        }
+        if "ingest" in args.scenarios:
+            report["results"]["ingest"] = bench_ingest(args, tmp_dir)
+        if {"filter", "download"} & set(args.scenarios):
+            report["results"]["datagen"] = fill_documents(args.rows, args.seed)
+        if "filter" in args.scenarios:
+            report["results"]["filter"] = bench_filter(args)
+        if "download" in args.scenarios:
+            report["results"]["download"] = bench_download(args)
+
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
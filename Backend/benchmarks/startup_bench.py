@@ -0,0 +1,97 @@
+# startup_bench.py
+"""Cold-start timings for the API: import, first request and background engine warm-up.
+
+Each trial runs in a fresh interpreter so module caches do not carry over.
+
+Usage (from Backend/):
+    python benchmarks/startup_bench.py --trials 5
+    python benchmarks/startup_bench.py --trials 3 --wait-engines --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries that should only load once the first receipt (or warm-up) needs them
+HEAVY_MODULES = ("torch", "easyocr", "cv2", "pdf2image", "PyPDF2", "langchain_groq", "langchain_core", "numpy")
+
+TRIAL = r"""
+import json, sys, time
+start = time.perf_counter()
+from app import app
+imported = time.perf_counter() - start
+from fastapi.testclient import TestClient
+from Extraction import engine_status
+result = {"import_s": imported, "heavy_modules": sorted(m for m in HEAVY if m in sys.modules)}
+with TestClient(app) as client:
+    client.get("/documents").raise_for_status()
+    result["first_request_s"] = time.perf_counter() - start
+    if WAIT_ENGINES:
+        # ocr_reader only turns true when OCR_WARM_ON_STARTUP also loads the model
+        deadline = time.perf_counter() + TIMEOUT
+        while time.perf_counter() < deadline:
+            status = engine_status()
+            if all(value for name, value in status.items() if name != "ocr_reader"):
+                result["engines_warm_s"] = time.perf_counter() - start
+                break
+            time.sleep(0.02)
+        result["engines"] = engine_status()
+print(json.dumps(result))
+"""
+
+
+def run_trial(tmp_dir: str, wait_engines: bool, timeout: float) -> dict:
+    env = dict(os.environ)
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp_dir, 'startup.db')}"
+    env["CACHE_DB_PATH"] = os.path.join(tmp_dir, "cache.db")
+    env.setdefault("SQL_ECHO", "false")
+    env.setdefault("ENGINE_WARMUP_ON_STARTUP", "true" if wait_engines else "false")
+    code = f"HEAVY = {HEAVY_MODULES!r}\nWAIT_ENGINES = {wait_engines!r}\nTIMEOUT = {timeout!r}\n" + TRIAL
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(trials) -> dict:
+    summary = {}
+    for key in ("import_s", "first_request_s", "engines_warm_s"):
+        values = [trial[key] for trial in trials if key in trial]
+        if values:
+            summary[key] = {
+                "median": round(statistics.median(values), 3),
+                "min": round(min(values), 3),
+                "max": round(max(values), 3),
+            }
+    summary["heavy_modules_after_import"] = trials[-1]["heavy_modules"]
+    if "engines" in trials[-1]:
+        summary["engines"] = trials[-1]["engines"]
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument("--wait-engines", action="store_true", help="also time the background OCR/PDF/LLM warm-up")
+    parser.add_argument("--timeout", type=float, default=300.0, help="seconds to wait for warm engines per trial")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        trials = [run_trial(tmp_dir, args.wait_engines, args.timeout) for _ in range(args.trials)]
+
+    output = json.dumps({"summary": summarize(trials), "trials": trials}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
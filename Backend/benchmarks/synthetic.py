@@ -0,0 +1,131 @@
+# synthetic.py
+"""Synthetic receipts for benchmarks: plain text, phone-photo images, text-layer and scanned PDFs."""
+import random
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+VENDORS = [
+    ("FRESH MART SUPERMARKET", "Food"),
+    ("CITY CAB CO", "Transport"),
+    ("SPARK ELECTRICITY", "Utilities"),
+    ("GALAXY CINEMAS", "Entertainment"),
+    ("URBAN OUTFITTERS", "Shopping"),
+    ("WELLNESS PHARMACY", "Health"),
+    ("JOE'S COFFEE HOUSE", "Food"),
+    ("METRO FUEL STATION", "Transport"),
+]
+ITEMS = ["Milk 2L", "Bread Wholegrain", "Eggs (12)", "Coffee Beans 500g", "Service Fee",
+         "Ticket", "Shirt", "Vitamins", "Fuel 20L", "Sandwich", "Monthly Plan", "Parking"]
+
+SAMPLE_LINES = [
+    "FRESH MART SUPERMARKET",
+    "12 Market Road, Springfield",
+    "Date: 2024-03-14  Time: 18:42",
+    "Milk 2L                 3.49",
+    "Bread Wholegrain        2.99",
+    "Eggs (12)               4.25",
+    "Coffee Beans 500g      11.80",
+    "Subtotal               22.53",
+    "Tax                     1.80",
+    "TOTAL                  24.33",
+    "Thank you for shopping!",
+]
+
+RECEIPT_KINDS = ("txt", "pdf_text", "image", "pdf_scanned")
+KIND_EXTENSIONS = {"txt": ".txt", "pdf_text": ".pdf", "image": ".jpg", "pdf_scanned": ".pdf"}
+
+
+def receipt_lines(seed: int) -> Tuple[List[str], Dict]:
+    """Random but reproducible receipt text plus the fields an extractor should find"""
+    rng = random.Random(seed)
+    vendor, category = rng.choice(VENDORS)
+    day = date(2023, 1, 1) + timedelta(days=rng.randrange(730))
+    items = [(rng.choice(ITEMS), round(rng.uniform(1, 80), 2)) for _ in range(rng.randint(2, 8))]
+    subtotal = round(sum(price for _, price in items), 2)
+    tax = round(subtotal * 0.08, 2)
+    total = round(subtotal + tax, 2)
+    lines = [vendor, f"Receipt #{seed:06d}", f"Date: {day.isoformat()}"]
+    lines += [f"{name:<22}{price:>8.2f}" for name, price in items]
+    lines += [f"{'Subtotal':<22}{subtotal:>8.2f}", f"{'Tax':<22}{tax:>8.2f}", f"{'TOTAL':<22}{total:>8.2f}", "Thank you!"]
+    truth = {"vendor_name": vendor, "date": day.isoformat(), "amount": total, "category": category}
+    return lines, truth
+
+
+def receipt_image(lines: List[str] = SAMPLE_LINES, size=(4000, 3000), skew: float = 3.0, exif_rotated: bool = True):
+    """A receipt on a dark table, slightly skewed, stored sideways with an EXIF orientation tag"""
+    font = ImageFont.load_default(size=110)
+    paper = Image.new("L", (1900, 200 + 165 * len(lines)), 245)
+    draw = ImageDraw.Draw(paper)
+    for i, line in enumerate(lines):
+        draw.text((100, 100 + 165 * i), line, fill=20, font=font)
+    paper = paper.rotate(skew, expand=True, fillcolor=0, resample=Image.Resampling.BICUBIC)
+    scale = min(1.0, 0.9 * size[0] / paper.width, 0.9 * size[1] / paper.height)
+    if scale < 1.0:
+        paper = paper.resize((int(paper.width * scale), int(paper.height * scale)))
+    photo = Image.new("L", size, 60)
+    photo.paste(paper, ((size[0] - paper.width) // 2, (size[1] - paper.height) // 2), paper.point(lambda p: 255 if p else 0))
+    photo = photo.convert("RGB")
+    exif = Image.Exif()
+    if exif_rotated:
+        # Stored rotated; orientation 6 tells viewers to rotate 90 degrees clockwise
+        photo = photo.transpose(Image.Transpose.ROTATE_90)
+        exif[0x0112] = 6
+    return photo, exif
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def text_layer_pdf(lines: List[str]) -> bytes:
+    """Single-page PDF with a real text layer (Helvetica), no external dependencies"""
+    stream = "BT /F1 11 Tf 14 TL 50 800 Td " + " ".join(f"({_pdf_escape(line)}) Tj T*" for line in lines) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+        "/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return bytes(out)
+
+
+def scanned_pdf(lines: List[str], pages: int = 1) -> bytes:
+    """Image-only PDF, as produced by a scanner: no text layer, OCR required"""
+    import io
+    page = receipt_image(lines, size=(1654, 2339), skew=1.0, exif_rotated=False)[0].convert("L")
+    buffer = io.BytesIO()
+    page.save(buffer, "PDF", resolution=200, save_all=pages > 1, append_images=[page] * (pages - 1))
+    return buffer.getvalue()
+
+
+def make_receipt(kind: str, seed: int) -> Tuple[bytes, str, Dict]:
+    """Return (file bytes, extension, expected fields) for one synthetic receipt"""
+    import io
+    lines, truth = receipt_lines(seed)
+    if kind == "txt":
+        data = "\n".join(lines).encode("utf-8")
+    elif kind == "pdf_text":
+        data = text_layer_pdf(lines)
+    elif kind == "image":
+        photo, exif = receipt_image(lines, skew=2.0 + seed % 3)
+        buffer = io.BytesIO()
+        photo.save(buffer, "JPEG", quality=90, exif=exif)
+        data = buffer.getvalue()
+    elif kind == "pdf_scanned":
+        data = scanned_pdf(lines)
+    else:
+        raise ValueError(f"Unknown receipt kind: {kind}")
+    return data, KIND_EXTENSIONS[kind], truth
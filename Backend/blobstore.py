@@ -0,0 +1,269 @@
+# blobstore.py
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import ContextManager, Iterator, Optional
+
+from config import (
+    BLOB_STORE_BACKEND,
+    BLOB_STORE_DIR,
+    BLOB_S3_BUCKET,
+    BLOB_S3_PREFIX,
+    BLOB_S3_ENDPOINT_URL,
+    BLOB_S3_REGION,
+)
+from metrics import timed
+
+CHUNK_SIZE = 256 * 1024
+
+
+def blob_key(digest: str, extension: str = "") -> str:
+    """Content address of a file: its SHA-256 plus the (lowercased) extension extraction dispatches on"""
+    return f"{digest}{extension.lower()}"
+
+
+def _valid_key(key: str) -> bool:
+    digest = key.split(".", 1)[0]
+    return len(digest) == 64 and all(c in "0123456789abcdef" for c in digest) and "/" not in key and "\\" not in key
+
+
+class BlobStore:
+    """Immutable, content-addressed storage for uploaded originals.
+
+    Keys are `<sha256><extension>`, so storing the same bytes twice is a no-op and
+    blobs can be shared by several documents. Backends shard keys by hash prefix,
+    which keeps every directory (or listing) small however many files are stored.
+    """
+
+    def shard_path(self, key: str) -> str:
+        if not _valid_key(key):
+            raise ValueError(f"Invalid blob key: {key!r}")
+        return f"{key[0:2]}/{key[2:4]}/{key}"
+
+    def put(self, data: bytes, extension: str = "", digest: Optional[str] = None) -> str:
+        """Store `data` (hashed here unless `digest` is given) and return its key"""
+        key = blob_key(digest or hashlib.sha256(data).hexdigest(), extension)
+        if not self.exists(key):
+            self._write(key, data)
+        return key
+
+    def put_file(self, file_path: str, extension: str = "", digest: Optional[str] = None) -> str:
+        """Store the file at `file_path` without reading it into memory; the file is consumed
+        (moved into place or removed), so pass a spooled copy, not an original"""
+        try:
+            key = blob_key(digest or _file_digest(file_path), extension)
+            if not self.exists(key):
+                self._write_file(key, file_path)
+            return key
+        finally:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+    @property
+    def spool_dir(self) -> Optional[str]:
+        """Where to spool incoming uploads so `put_file` is cheapest (None = system temp dir)"""
+        return None
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def size(self, key: str) -> int:
+        raise NotImplementedError
+
+    def iter_range(self, key: str, start: int = 0, end: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Yield bytes `start`..`end` (inclusive; None = end of blob) in chunks"""
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> ContextManager[str]:
+        """Context manager giving a filesystem path that holds the blob while it is open"""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def _write(self, key: str, data: bytes):
+        raise NotImplementedError
+
+    def _write_file(self, key: str, file_path: str):
+        raise NotImplementedError
+
+
+def _file_digest(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FileSystemBlobStore(BlobStore):
+    """Blobs under `root/ab/cd/<key>`: 65,536 leaf directories, so even millions of files stay a few dozen per directory"""
+
+    def __init__(self, root: str = BLOB_STORE_DIR):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, *self.shard_path(key).split("/"))
+
+    @property
+    def spool_dir(self) -> str:
+        # Same filesystem as the blobs, so put_file is a rename rather than a copy
+        path = os.path.join(self.root, ".incoming")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def size(self, key: str) -> int:
+        return os.path.getsize(self.path(key))
+
+    @timed("blob_put")
+    def _write(self, key: str, data: bytes):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write under a temporary name and rename, so readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @timed("blob_put")
+    def _write_file(self, key: str, file_path: str):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            os.replace(file_path, path)
+        except OSError:
+            # Different filesystem: copy under a temporary name, then rename
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as out, open(file_path, "rb") as src:
+                    shutil.copyfileobj(src, out, CHUNK_SIZE)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+    def iter_range(self, key: str, start: int = 0, end: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        with open(self.path(key), "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    @contextmanager
+    def local_path(self, key: str) -> Iterator[str]:
+        yield self.path(key)
+
+    def delete(self, key: str):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3BlobStore(BlobStore):
+    """Blobs in an S3 bucket under `prefix/ab/cd/<key>`; `endpoint_url` points it at MinIO or another S3-compatible server"""
+
+    def __init__(self, bucket: str = BLOB_S3_BUCKET, prefix: str = BLOB_S3_PREFIX,
+                 endpoint_url: Optional[str] = BLOB_S3_ENDPOINT_URL, region: Optional[str] = BLOB_S3_REGION):
+        try:
+            import boto3
+        except ImportError as e:
+            raise RuntimeError("The S3 blob store needs boto3 (pip install boto3)") from e
+        if not bucket:
+            raise ValueError("BLOB_S3_BUCKET must be set for the S3 blob store")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self._client = boto3.client("s3", endpoint_url=endpoint_url or None, region_name=region or None)
+
+    def object_key(self, key: str) -> str:
+        shard = self.shard_path(key)
+        return f"{self.prefix}/{shard}" if self.prefix else shard
+
+    def _head(self, key: str) -> Optional[dict]:
+        from botocore.exceptions import ClientError
+        try:
+            return self._client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def exists(self, key: str) -> bool:
+        return self._head(key) is not None
+
+    def size(self, key: str) -> int:
+        head = self._head(key)
+        if head is None:
+            raise FileNotFoundError(key)
+        return head["ContentLength"]
+
+    @timed("blob_put")
+    def _write(self, key: str, data: bytes):
+        self._client.put_object(Bucket=self.bucket, Key=self.object_key(key), Body=data)
+
+    @timed("blob_put")
+    def _write_file(self, key: str, file_path: str):
+        # upload_file streams from disk, switching to multipart uploads for large files
+        self._client.upload_file(file_path, self.bucket, self.object_key(key))
+
+    def iter_range(self, key: str, start: int = 0, end: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        byte_range = f"bytes={start}-{'' if end is None else end}"
+        body = self._client.get_object(Bucket=self.bucket, Key=self.object_key(key), Range=byte_range)["Body"]
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    @contextmanager
+    def local_path(self, key: str) -> Iterator[str]:
+        # OCR and pdf2image need a real file, so download to a temporary copy
+        fd, tmp_path = tempfile.mkstemp(suffix=os.path.splitext(key)[1])
+        try:
+            with os.fdopen(fd, "wb") as f:
+                self._client.download_fileobj(self.bucket, self.object_key(key), f)
+            yield tmp_path
+        finally:
+            os.remove(tmp_path)
+
+    def delete(self, key: str):
+        self._client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+
+
+def create_blob_store(backend: str = BLOB_STORE_BACKEND) -> BlobStore:
+    if backend == "filesystem":
+        return FileSystemBlobStore()
+    if backend == "s3":
+        return S3BlobStore()
+    raise ValueError(f"Unknown blob store backend: {backend}")
+
+
+_blob_store: Optional[BlobStore] = None
+_blob_store_lock = threading.Lock()
+
+
+def get_blob_store() -> BlobStore:
+    """Process-wide store for the configured backend (BLOB_STORE_BACKEND)"""
+    global _blob_store
+    if _blob_store is None:
+        with _blob_store_lock:
+            if _blob_store is None:
+                _blob_store = create_blob_store()
+    return _blob_store
@@ -0,0 +1,181 @@
+# cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, NamedTuple, Optional
+
+from config import (
+    CACHE_DB_PATH,
+    DEDUP_CACHE_MAX_ENTRIES,
+    PARSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_CACHE_TTL,
+)
+
+
+class PersistentCache:
+    """Size-bounded key/value cache stored in a SQLite file.
+
+    Values are JSON-encoded. When the entry count exceeds `max_entries` the
+    least recently used entries are evicted. Hit/miss/eviction counters are
+    kept per process.
+    """
+
+    def __init__(self, path: str, table: str, max_entries: int):
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_last_used ON {table} (last_used)")
+        self._size = self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(f"UPDATE {self.table} SET last_used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any):
+        now = time.time()
+        encoded = json.dumps(value, default=str)
+        with self._lock:
+            exists = self._conn.execute(f"SELECT 1 FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, encoded, now, now),
+            )
+            if not exists:
+                self._size += 1
+            self._evict()
+
+    def delete(self, key: str):
+        with self._lock:
+            deleted = self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,)).rowcount
+            self._size -= deleted
+
+    def _evict(self):
+        excess = self._size - self.max_entries
+        if excess <= 0:
+            return
+        self._conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN "
+            f"(SELECT key FROM {self.table} ORDER BY last_used ASC LIMIT ?)",
+            (excess,),
+        )
+        self._size -= excess
+        self.evictions += excess
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._size = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+    expires: float
+
+
+class ResponseCache:
+    """In-memory LRU of serialized JSON responses with content-derived ETags.
+
+    Callers put the documents table version in the key, so a write makes every
+    older entry unreachable (they age out of the LRU). `ttl` bounds how long an
+    entry is trusted, which covers writes made by other worker processes.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires <= time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key: Hashable, body: bytes, headers: Optional[Dict[str, str]] = None) -> CachedResponse:
+        """Build (and, if it fits, keep) an entry; the ETag depends only on the body"""
+        entry = CachedResponse(
+            body, f'"{hashlib.sha1(body).hexdigest()[:20]}"', dict(headers or {}), time.monotonic() + self.ttl
+        )
+        if self.max_entries <= 0 or len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous.body)
+            self._entries[key] = entry
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.body)
+                self.evictions += 1
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Content-hash keyed OCR text and parsed fields for uploaded files
+extraction_cache = PersistentCache(CACHE_DB_PATH, "extraction_results", DEDUP_CACHE_MAX_ENTRIES)
+
+# LLM parse results keyed by normalized OCR text plus prompt/model version
+parse_cache = PersistentCache(CACHE_DB_PATH, "parse_results", PARSE_CACHE_MAX_ENTRIES)
+
+# Serialized document listing / filter responses keyed by request and table version
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL)
@@ -0,0 +1,122 @@
+# config.py
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    try:
+        return int(value) if value not in (None, "") else default
+    except ValueError:
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+
+# OCR engine pool
+OCR_LANGUAGES = [lang.strip() for lang in os.getenv("OCR_LANGUAGES", "en").split(",") if lang.strip()]
+OCR_USE_GPU = _env_bool("OCR_USE_GPU", False)
+OCR_POOL_SIZE = _env_int("OCR_POOL_SIZE", 0)  # 0 = derive from cores and memory
+OCR_READER_MEMORY_MB = _env_int("OCR_READER_MEMORY_MB", 600)
+OCR_WARM_ON_STARTUP = _env_bool("OCR_WARM_ON_STARTUP", False)
+# Image preprocessing before OCR: off | fast | balanced | quality
+OCR_PREPROCESS_PROFILE = os.getenv("OCR_PREPROCESS_PROFILE", "balanced")
+
+# Background ingestion jobs
+JOB_WORKERS = _env_int("JOB_WORKERS", min(4, os.cpu_count() or 1))
+JOB_HISTORY_LIMIT = _env_int("JOB_HISTORY_LIMIT", 1000)
+
+# Batch ingestion
+BATCH_PROCESS_WORKERS = _env_int("BATCH_PROCESS_WORKERS", os.cpu_count() or 1)
+LLM_BATCH_CONCURRENCY = _env_int("LLM_BATCH_CONCURRENCY", 4)
+
+# Extraction caches (stored next to the documents database)
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "./cache.db")
+DEDUP_CACHE_MAX_ENTRIES = _env_int("DEDUP_CACHE_MAX_ENTRIES", 10000)
+DEDUP_SKIP_DUPLICATES = _env_bool("DEDUP_SKIP_DUPLICATES", False)
+PARSE_CACHE_MAX_ENTRIES = _env_int("PARSE_CACHE_MAX_ENTRIES", 50000)
+
+# LLM
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq")  # groq | local (offline stand-in)
+LLM_MODEL = os.getenv("LLM_MODEL", "llama3-70b-8192")
+LLM_MAX_CONCURRENCY = _env_int("LLM_MAX_CONCURRENCY", LLM_BATCH_CONCURRENCY)  # in-flight calls per process
+LLM_RATE_PER_MINUTE = float(os.getenv("LLM_RATE_PER_MINUTE", "30"))  # 0 = unlimited
+LLM_RATE_BURST = _env_int("LLM_RATE_BURST", 5)
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "30"))
+LLM_MAX_RETRIES = _env_int("LLM_MAX_RETRIES", 3)
+LLM_RETRY_BASE_S = float(os.getenv("LLM_RETRY_BASE_S", "0.5"))
+LLM_RETRY_MAX_S = float(os.getenv("LLM_RETRY_MAX_S", "20"))
+# Pack several short receipts into one prompt during batch parsing (1 disables packing)
+LLM_PACK_MAX_RECEIPTS = _env_int("LLM_PACK_MAX_RECEIPTS", 4)
+LLM_PACK_MAX_CHARS = _env_int("LLM_PACK_MAX_CHARS", 6000)
+LLM_PACK_ITEM_MAX_CHARS = _env_int("LLM_PACK_ITEM_MAX_CHARS", 1500)
+
+# Rule-based fast path: minimum confidence to skip the LLM (above 1 disables it)
+RULES_CONFIDENCE_THRESHOLD = float(os.getenv("RULES_CONFIDENCE_THRESHOLD", "0.85"))
+
+# Re-parsing stored OCR text (POST /documents/reprocess): documents per parse/update round
+REPROCESS_BATCH_SIZE = _env_int("REPROCESS_BATCH_SIZE", 200)
+
+# In-process LRU of serialized /documents and /filter_documents responses (0 entries disables it).
+# Entries are keyed by the documents table version; the TTL bounds staleness from other worker processes.
+RESPONSE_CACHE_MAX_ENTRIES = _env_int("RESPONSE_CACHE_MAX_ENTRIES", 512)
+RESPONSE_CACHE_MAX_BYTES = _env_int("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+RESPONSE_CACHE_TTL = _env_int("RESPONSE_CACHE_TTL", 30)
+
+# Exports
+EXPORT_CHUNK_SIZE = _env_int("EXPORT_CHUNK_SIZE", 1000)
+# Parquet / Arrow exports (need pyarrow): rows per record batch (and Parquet row group), and codecs
+COLUMNAR_BATCH_ROWS = _env_int("COLUMNAR_BATCH_ROWS", 65536)
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+ARROW_IPC_COMPRESSION = os.getenv("ARROW_IPC_COMPRESSION", "zstd")
+
+# Database
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./local_documents.db")
+SQL_ECHO = _env_bool("SQL_ECHO", False)
+DB_POOL_SIZE = _env_int("DB_POOL_SIZE", 10)
+DB_MAX_OVERFLOW = _env_int("DB_MAX_OVERFLOW", 20)
+DB_POOL_TIMEOUT = _env_int("DB_POOL_TIMEOUT", 30)
+# SQLite only: applied as PRAGMAs on every new connection
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE_KB = _env_int("SQLITE_CACHE_SIZE_KB", 64 * 1024)
+SQLITE_MMAP_SIZE = _env_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)
+SQLITE_BUSY_TIMEOUT_MS = _env_int("SQLITE_BUSY_TIMEOUT_MS", 5000)
+# Serve CRUD/listing endpoints through SQLAlchemy asyncio (db_async.py); needs aiosqlite or asyncpg
+DB_ASYNC_ENABLED = _env_bool("DB_ASYNC_ENABLED", False)
+# Defaults to DATABASE_URL with its async driver (sqlite+aiosqlite, postgresql+asyncpg)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "")
+
+# Scanned PDF rasterization
+PDF_OCR_DPI = _env_int("PDF_OCR_DPI", 200)
+PDF_OCR_WINDOW = max(1, _env_int("PDF_OCR_WINDOW", 1))  # pages held in memory at once
+PDF_OCR_STOP_AT_TOTALS = _env_bool("PDF_OCR_STOP_AT_TOTALS", True)
+
+# Upload reception: bodies are streamed to disk in chunks; larger uploads get 413
+MAX_UPLOAD_BYTES = _env_int("MAX_UPLOAD_BYTES", 25 * 1024 * 1024)  # per file (and per zip member)
+MAX_BATCH_UPLOAD_BYTES = _env_int("MAX_BATCH_UPLOAD_BYTES", 500 * 1024 * 1024)  # per /upload/batch request, zips expanded
+MAX_BATCH_FILES = _env_int("MAX_BATCH_FILES", 1000)  # per /upload/batch request, counting zip members
+UPLOAD_CHUNK_SIZE = _env_int("UPLOAD_CHUNK_SIZE", 1024 * 1024)
+
+# Uploaded originals: content-addressed blob store (filesystem | s3)
+BLOB_STORE_BACKEND = os.getenv("BLOB_STORE_BACKEND", "filesystem")
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", "./Saved_data")
+# s3 backend; set the endpoint to use MinIO or another S3-compatible server
+BLOB_S3_BUCKET = os.getenv("BLOB_S3_BUCKET", "")
+BLOB_S3_PREFIX = os.getenv("BLOB_S3_PREFIX", "receipts")
+BLOB_S3_ENDPOINT_URL = os.getenv("BLOB_S3_ENDPOINT_URL")
+BLOB_S3_REGION = os.getenv("BLOB_S3_REGION")
+
+# Metrics: stage timers, request histograms and GET /metrics (off = no recording)
+METRICS_ENABLED = _env_bool("METRICS_ENABLED", True)
+
+# Import the OCR/PDF/LLM stacks in a background thread at startup (the API serves meanwhile)
+ENGINE_WARMUP_ON_STARTUP = _env_bool("ENGINE_WARMUP_ON_STARTUP", True)
@@ -1,16 +1,58 @@
 # db.py
-from sqlalchemy import Column, Integer, String, Text, Numeric, DateTime, Index, create_engine, and_
-from sqlalchemy.orm import declarative_base, sessionmaker, Session
-from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, Numeric, Date, DateTime, Index, create_engine, and_, or_, func, event, inspect, text, select, literal_column, table, column
+from sqlalchemy import insert as sa_insert, update as sa_update, bindparam, LargeBinary
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import declarative_base, deferred, sessionmaker, Session
+from datetime import datetime, timedelta
+from decimal import Decimal
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import date
 from sqlalchemy import and_
 from typing import List
 from datetime import date
+import base64
+import json
+import re
+import threading
+import time
+import zlib
+
+from config import (
+    DATABASE_URL,
+    SQL_ECHO,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    SQLITE_SYNCHRONOUS,
+    SQLITE_CACHE_SIZE_KB,
+    SQLITE_MMAP_SIZE,
+    SQLITE_BUSY_TIMEOUT_MS,
+)
+from metrics import timed
 
 Base = declarative_base()
 
+# extractor_version of documents whose parsed fields a user has edited; reprocessing leaves them alone unless forced
+MANUAL_EXTRACTOR_VERSION = "manual"
+
+class CompressedText(TypeDecorator):
+    """Text stored zlib-compressed, so keeping full OCR output per document stays cheap"""
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return zlib.compress(value.encode("utf-8"), 6) if value is not None else None
+
+    def process_result_value(self, value, dialect):
+        return inflate_text(value)
+
+def inflate_text(value: Optional[bytes]) -> Optional[str]:
+    """Decode a CompressedText value; also registered as the SQL function inflate_text() on SQLite
+    connections, so the full-text triggers can index the OCR text"""
+    return zlib.decompress(value).decode("utf-8") if value is not None else None
+
 class Document(Base):
     __tablename__ = 'documents'
     id = Column(Integer, primary_key=True, index=True)
@@ -18,9 +60,59 @@ class Document(Base):
     data = Column(Text)
     amount = Column(Numeric(12, 2), index=True)
     category = Column(String(50), index=True)
+    # Date printed on the receipt; created_at is when the row was ingested
+    receipt_date = Column(Date, index=True)
+    # Lowercased, trimmed copies used for indexed prefix/equality filtering
+    vendor_norm = Column(String(100))
+    category_norm = Column(String(50))
+    # Content address of the uploaded original in the blob store (None for manual entries)
+    blob_key = Column(String(80))
+    # Full OCR output, so documents can be re-parsed without re-running OCR; only loaded when accessed
+    ocr_text = deferred(Column(CompressedText))
+    # Prompt/model that produced vendor, amount, category and date (see ReceiptProcessor.extractor_version),
+    # or MANUAL_EXTRACTOR_VERSION once a user has edited them
+    extractor_version = Column(String(120))
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Last write to the row; incremental exports select rows changed after a watermark
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index('idx_vendor_category', 'vendor', 'category'),
+        Index('idx_receipt_date_id', 'receipt_date', 'id'),
+        Index('idx_vendor_norm_date', 'vendor_norm', 'receipt_date', 'id'),
+        Index('idx_category_norm_date', 'category_norm', 'receipt_date', 'id'),
+        Index('idx_blob_key', 'blob_key'),
+        Index('idx_updated_at', 'updated_at'),
+    )
+
+def normalize_label(value: Optional[str]) -> Optional[str]:
+    return value.strip().lower() if value else None
+
+@event.listens_for(Document, "before_insert")
+@event.listens_for(Document, "before_update")
+def _set_normalized_columns(mapper, connection, doc):
+    doc.vendor_norm = normalize_label(doc.vendor)
+    doc.category_norm = normalize_label(doc.category)
 
-    __table_args__ = (Index('idx_vendor_category', 'vendor', 'category'),)
+class DailyStat(Base):
+    """Per-day totals by vendor and category, kept in step with `documents` on every write"""
+    __tablename__ = 'document_daily_stats'
+    day = Column(Date, primary_key=True)
+    vendor = Column(String(100), primary_key=True, default="")
+    category = Column(String(50), primary_key=True, default="")
+    # Same normalization as documents.vendor_norm / category_norm, so stats filters match /filter_documents
+    vendor_norm = Column(String(100))
+    category_norm = Column(String(50))
+    total = Column(Numeric(14, 2), nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index('idx_daily_stats_vendor_norm', 'vendor_norm', 'day'),
+        Index('idx_daily_stats_category_norm', 'category_norm', 'day'),
+    )
+
+# Buckets never change key once created, so setting the normalized keys on insert is enough
+event.listen(DailyStat, "before_insert", _set_normalized_columns)
 
 # class DocumentFilter(BaseModel):
 #     vendor: Optional[str] = None
@@ -37,11 +129,73 @@ class DocumentFilter(BaseModel):
     minAmount: Optional[float] = None
     maxAmount: Optional[float] = None
     category: Optional[str] = None
+    q: Optional[str] = None  # full-text search over vendor, category and text
+
+# Short-lived COUNT(*) results per filter, so paging does not recount every time
+COUNT_CACHE_TTL = 30
+COUNT_CACHE_MAX_ENTRIES = 256
+_count_cache = {}
+
+# Bumped after every committed write to `documents`; read-side caches key on it, so
+# they never serve results from before a write made by this process
+_documents_version = 0
+_documents_version_lock = threading.Lock()
+
+def documents_version() -> int:
+    return _documents_version
+
+def _bump_documents_version():
+    global _documents_version
+    with _documents_version_lock:
+        _documents_version += 1
 
 # DB setup
-DATABASE_URL = "sqlite:///./local_documents.db"
-engine = create_engine(DATABASE_URL, echo=True)
+def _create_engine(url: str):
+    url = make_url(url)
+    options = {"echo": SQL_ECHO, "pool_pre_ping": True}
+    if url.get_backend_name() == "sqlite":
+        # Pooled connections are handed between request and job threads
+        options["connect_args"] = {"check_same_thread": False}
+        if url.database in (None, "", ":memory:"):
+            return create_engine(url, **options)
+    options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return create_engine(url, **options)
+
+def _install_sqlite_hooks(engine):
+    """Connection PRAGMAs and explicit BEGIN for a SQLite engine (sync, or an async engine's sync_engine)"""
+    @event.listens_for(engine, "connect")
+    def _configure_sqlite(dbapi_connection, connection_record):
+        # Let SQLAlchemy emit BEGIN itself (see _begin_sqlite) instead of pysqlite
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        # WAL lets readers keep a snapshot while a writer commits
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+        # Used by the documents_fts triggers; any connection writing to documents needs it
+        dbapi_connection.create_function("inflate_text", 1, inflate_text)
+
+    @event.listens_for(engine, "begin")
+    def _begin_sqlite(conn):
+        # Writers take the write lock up front so busy_timeout queues them;
+        # a deferred read-then-write transaction fails at once if another
+        # writer committed since its snapshot was taken
+        conn.exec_driver_sql(f"BEGIN {conn.get_execution_options().get('sqlite_begin', 'DEFERRED')}")
+
+engine = _create_engine(DATABASE_URL)
+
+if engine.dialect.name == "sqlite":
+    _install_sqlite_hooks(engine)
+
+# Sessions that modify documents; reads stay on the deferred SessionLocal
+write_engine = engine.execution_options(sqlite_begin="IMMEDIATE")
+
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+WriteSessionLocal = sessionmaker(bind=write_engine, autoflush=False, autocommit=False)
 
 # Dependency for FastAPI
 def get_db():
@@ -51,21 +205,254 @@ def get_db():
     finally:
         db.close()
 
+def get_write_db():
+    db = WriteSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Summary table maintenance
+def _stats_delta(deltas: dict, receipt_date: date, vendor: str, category: str, amount, count: int):
+    """Accumulate adding (count=1) or removing (count=-1) one document from its daily bucket"""
+    key = (receipt_date, vendor or "", category or "")
+    prev_total, prev_count = deltas.get(key, (Decimal("0"), 0))
+    deltas[key] = (prev_total + Decimal(str(amount or 0)) * count, prev_count + count)
+    return deltas
+
+def _apply_stats_deltas(db: Session, deltas: dict):
+    """Apply net per-bucket changes to the summary table in the current transaction"""
+    # Load every touched day in a few queries instead of one lookup per bucket
+    days = list({key[0] for key in deltas})
+    existing = {}
+    for i in range(0, len(days), 500):
+        for stat in db.query(DailyStat).filter(DailyStat.day.in_(days[i:i + 500])):
+            existing[(stat.day, stat.vendor, stat.category)] = stat
+    for key, (total, count) in deltas.items():
+        if not count and not total:
+            continue
+        stat = existing.get(key)
+        if stat is None:
+            stat = DailyStat(day=key[0], vendor=key[1], category=key[2], total=Decimal("0"), count=0)
+            db.add(stat)
+        stat.total = Decimal(stat.total or 0) + total
+        stat.count = (stat.count or 0) + count
+        if stat.count <= 0:
+            if stat in db.new:
+                db.expunge(stat)
+            else:
+                db.delete(stat)
+
+def rebuild_daily_stats(db: Session):
+    """Recompute the summary table from scratch with a single GROUP BY"""
+    db.query(DailyStat).delete()
+    day = Document.receipt_date
+    rows = (
+        db.query(day, Document.vendor, Document.category, func.sum(Document.amount), func.count(Document.id))
+        .group_by(day, Document.vendor, Document.category)
+        .all()
+    )
+    merged = {}
+    for day_value, vendor, category, total, count in rows:
+        if isinstance(day_value, str):
+            day_value = date.fromisoformat(day_value)
+        key = (day_value, vendor or "", category or "")
+        prev_total, prev_count = merged.get(key, (Decimal("0"), 0))
+        merged[key] = (prev_total + Decimal(str(total or 0)), prev_count + count)
+    db.add_all(
+        DailyStat(day=key[0], vendor=key[1], category=key[2], total=total, count=count)
+        for key, (total, count) in merged.items()
+    )
+    db.commit()
+
 # CRUD functions (use injected db)
-def insert(db: Session, vendor: str, data: str, amount: float, category: str, date: str):
-    parsed_date = datetime.strptime(date, '%Y-%m-%d') if date else datetime.utcnow()
+def parse_receipt_date(date: str) -> datetime:
+    return datetime.strptime(date, '%Y-%m-%d') if date else datetime.utcnow()
+
+@timed("db_insert")
+def insert(db: Session, vendor: str, data: str, amount: float, category: str, date: str, blob_key: Optional[str] = None,
+           ocr_text: Optional[str] = None, extractor_version: Optional[str] = None):
+    parsed_date = parse_receipt_date(date).date()
     new_doc = Document(
         vendor=vendor,
         data=data,
         amount=amount,
         category=category,
-        created_at=parsed_date
+        receipt_date=parsed_date,
+        blob_key=blob_key,
+        ocr_text=ocr_text,
+        extractor_version=extractor_version
     )
     db.add(new_doc)
+    _apply_stats_deltas(db, _stats_delta({}, parsed_date, vendor, category, amount, 1))
     db.commit()
+    _bump_documents_version()
     db.refresh(new_doc)
     return new_doc
 
+@timed("db_bulk_insert")
+def bulk_insert(db: Session, rows: List[dict]) -> List[int]:
+    """Insert many documents with one executemany INSERT in a single transaction, returning their ids"""
+    if not rows:
+        return []
+    now = datetime.utcnow()
+    params = []
+    deltas = {}
+    dates = {}
+    for row in rows:
+        receipt_date = dates.get(row["date"])
+        if receipt_date is None:
+            receipt_date = dates[row["date"]] = parse_receipt_date(row["date"]).date()
+        # Core inserts bypass the mapper events, so fill the normalized columns here
+        params.append({
+            "vendor": row["vendor"],
+            "data": row.get("data"),
+            "amount": row["amount"],
+            "category": row["category"],
+            "receipt_date": receipt_date,
+            "vendor_norm": normalize_label(row["vendor"]),
+            "category_norm": normalize_label(row["category"]),
+            "blob_key": row.get("blob_key"),
+            "ocr_text": row.get("ocr_text"),
+            "extractor_version": row.get("extractor_version"),
+            "created_at": now,
+            "updated_at": now,
+        })
+        _stats_delta(deltas, receipt_date, row["vendor"], row["category"], row["amount"], 1)
+    if db.get_bind().dialect.name == "sqlite":
+        # Ordered RETURNING degrades to one INSERT per row on SQLite; within one
+        # write transaction rowids are handed out in insert order, so sort instead
+        stmt = sa_insert(Document.__table__).returning(Document.id)
+        ids = sorted(db.execute(stmt, params).scalars())
+    else:
+        stmt = sa_insert(Document.__table__).returning(Document.id, sort_by_parameter_order=True)
+        ids = list(db.execute(stmt, params).scalars())
+    _apply_stats_deltas(db, deltas)
+    db.commit()
+    _bump_documents_version()
+    return ids
+
+@timed("db_bulk_update")
+def bulk_update(db: Session, filters: DocumentFilter, values: dict) -> int:
+    """Set the same `values` (vendor, category, amount, date) on every document matching `filters`
+    with a single UPDATE, returning the number of rows changed"""
+    nulls = sorted(field for field, value in values.items() if value is None)
+    if nulls:
+        # A NULL amount breaks the listings and a NULL date would be read back as today
+        raise ValueError(f"Fields cannot be set to null: {', '.join(nulls)}")
+    changes = {}
+    if "vendor" in values:
+        changes[Document.vendor] = values["vendor"]
+        changes[Document.vendor_norm] = normalize_label(values["vendor"])
+    if "category" in values:
+        changes[Document.category] = values["category"]
+        changes[Document.category_norm] = normalize_label(values["category"])
+    if "amount" in values:
+        changes[Document.amount] = values["amount"]
+    if "date" in values:
+        changes[Document.receipt_date] = parse_receipt_date(values["date"]).date()
+    if not changes:
+        return 0
+    changes[Document.updated_at] = datetime.utcnow()
+    changes[Document.extractor_version] = MANUAL_EXTRACTOR_VERSION
+
+    conditions = _filter_conditions(filters)
+    # Move each affected summary bucket to where its rows end up after the update
+    buckets = (
+        db.query(Document.receipt_date, Document.vendor, Document.category, func.sum(Document.amount), func.count(Document.id))
+        .filter(*conditions)
+        .group_by(Document.receipt_date, Document.vendor, Document.category)
+        .all()
+    )
+    deltas = {}
+    for day, vendor, category, total, count in buckets:
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        total = Decimal(str(total or 0))
+        new_total = Decimal(str(values["amount"] or 0)) * count if "amount" in values else total
+        new_key = (
+            changes.get(Document.receipt_date, day),
+            values.get("vendor", vendor) or "",
+            values.get("category", category) or "",
+        )
+        for key, bucket_total, bucket_count in (((day, vendor or "", category or ""), -total, -count), (new_key, new_total, count)):
+            prev_total, prev_count = deltas.get(key, (Decimal("0"), 0))
+            deltas[key] = (prev_total + bucket_total, prev_count + bucket_count)
+
+    updated = db.query(Document).filter(*conditions).update(changes, synchronize_session=False)
+    _apply_stats_deltas(db, deltas)
+    db.commit()
+    _bump_documents_version()
+    return updated
+
+def get_reprocess_batch(db: Session, filters: DocumentFilter, extractor_version: Optional[str], after_id: int = 0,
+                        limit: int = 200) -> List[tuple]:
+    """Next (id, ocr_text) pairs after `after_id` for documents matching `filters` that have stored OCR
+    text, skipping those already parsed by `extractor_version` and those edited by hand (None = include
+    them all). Paging by id means rows updated between batches are neither skipped nor revisited."""
+    conditions = _filter_conditions(filters) + [Document.ocr_text.isnot(None), Document.id > after_id]
+    if extractor_version is not None:
+        conditions.append(or_(
+            Document.extractor_version.is_(None),
+            Document.extractor_version.notin_([extractor_version, MANUAL_EXTRACTOR_VERSION]),
+        ))
+    rows = db.query(Document.id, Document.ocr_text).filter(*conditions).order_by(Document.id).limit(limit).all()
+    return [(row.id, row.ocr_text) for row in rows]
+
+def count_without_ocr_text(db: Session, filters: DocumentFilter) -> int:
+    return db.query(func.count(Document.id)).filter(*_filter_conditions(filters), Document.ocr_text.is_(None)).scalar()
+
+def count_manually_edited(db: Session, filters: DocumentFilter) -> int:
+    return db.query(func.count(Document.id)).filter(
+        *_filter_conditions(filters), Document.ocr_text.isnot(None), Document.extractor_version == MANUAL_EXTRACTOR_VERSION
+    ).scalar()
+
+@timed("db_update_parsed")
+def update_parsed_fields(db: Session, updates: List[dict]) -> int:
+    """Overwrite the parsed fields of many documents (dicts with id, vendor, amount, category,
+    date, data, extractor_version) with one executemany UPDATE, keeping the summary table in step"""
+    if not updates:
+        return 0
+    ids = [update["id"] for update in updates]
+    deltas = {}
+    for i in range(0, len(ids), 500):
+        old_rows = (
+            db.query(Document.receipt_date, Document.vendor, Document.category, Document.amount)
+            .filter(Document.id.in_(ids[i:i + 500]))
+        )
+        for receipt_date, vendor, category, amount in old_rows:
+            _stats_delta(deltas, receipt_date, vendor, category, amount, -1)
+    params = []
+    now = datetime.utcnow()
+    for update in updates:
+        receipt_date = parse_receipt_date(update["date"]).date()
+        params.append({
+            "doc_id": update["id"],
+            "vendor": update["vendor"],
+            "vendor_norm": normalize_label(update["vendor"]),
+            "category": update["category"],
+            "category_norm": normalize_label(update["category"]),
+            "amount": update["amount"],
+            "receipt_date": receipt_date,
+            "data": update["data"],
+            "extractor_version": update["extractor_version"],
+            "updated_at": now,
+        })
+        _stats_delta(deltas, receipt_date, update["vendor"], update["category"], update["amount"], 1)
+    table = Document.__table__
+    stmt = sa_update(table).where(table.c.id == bindparam("doc_id")).values(
+        {name: bindparam(name) for name in params[0] if name != "doc_id"}
+    )
+    updated = db.execute(stmt, params).rowcount
+    _apply_stats_deltas(db, deltas)
+    db.commit()
+    _bump_documents_version()
+    return updated
+
+def get_document_ocr_text(db: Session, doc_id: int):
+    row = db.query(Document.ocr_text, Document.extractor_version).filter(Document.id == doc_id).first()
+    return {"id": doc_id, "ocr_text": row.ocr_text, "extractor_version": row.extractor_version} if row else None
+
 # def get_all_documents(db: Session):
 #     docs = db.query(Document).all()
 #     return [
@@ -85,7 +472,7 @@ def get_all_documents(db: Session, offset: int = 0, limit: int = 50):
         {
             "id": doc.id,
             "vendor": doc.vendor,
-            "date": doc.created_at.strftime("%Y-%m-%d"),
+            "date": doc.receipt_date.strftime("%Y-%m-%d"),
             "amount": float(doc.amount),
             "category": doc.category
         }
@@ -93,27 +480,91 @@ def get_all_documents(db: Session, offset: int = 0, limit: int = 50):
     ]
 
 
+def encode_cursor(receipt_date: date, doc_id: int) -> str:
+    """Opaque keyset cursor for the (receipt_date, id) sort order"""
+    raw = json.dumps([receipt_date.isoformat(), doc_id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str):
+    try:
+        receipt_date, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return date.fromisoformat(receipt_date), int(doc_id)
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def encode_offset_cursor(offset: int) -> str:
+    """Cursor for result sets ordered by rank, where keyset paging does not apply"""
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset}).encode("utf-8")).decode("ascii")
+
+def decode_offset_cursor(cursor: str) -> int:
+    try:
+        return int(json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))["offset"])
+    except (ValueError, TypeError, KeyError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def _after_cursor(cursor: str):
+    """Rows strictly after `cursor` in (receipt_date desc, id desc) order"""
+    receipt_date, doc_id = decode_cursor(cursor)
+    return or_(
+        Document.receipt_date < receipt_date,
+        and_(Document.receipt_date == receipt_date, Document.id < doc_id)
+    )
+
+def _keyset_page(query, cursor: Optional[str], limit: int, offset: int = 0):
+    """Apply keyset pagination: rows strictly after `cursor` in (receipt_date desc, id desc) order"""
+    if cursor:
+        query = query.filter(_after_cursor(cursor))
+    docs = query.order_by(Document.receipt_date.desc(), Document.id.desc()).offset(offset).limit(limit).all()
+    next_cursor = encode_cursor(docs[-1].receipt_date, docs[-1].id) if len(docs) == limit else None
+    return docs, next_cursor
+
+def get_documents_page(db: Session, cursor: Optional[str] = None, limit: int = 50):
+    """Cursor-paginated variant of get_all_documents; returns (documents, next_cursor)"""
+    docs, next_cursor = _keyset_page(db.query(Document), cursor, limit)
+    return [
+        {
+            "id": doc.id,
+            "vendor": doc.vendor,
+            "date": doc.receipt_date.strftime("%Y-%m-%d"),
+            "amount": float(doc.amount),
+            "category": doc.category
+        }
+        for doc in docs
+    ], next_cursor
+
+
 def get_document_by_id(db: Session, doc_id: int):
     doc = db.query(Document).filter(Document.id == doc_id).first()
     return {
         "id": doc.id,
         "vendor": doc.vendor,
-        "date": doc.created_at.strftime('%Y-%m-%d'),
+        "date": doc.receipt_date.strftime('%Y-%m-%d'),
         "amount": float(doc.amount),
         "category": doc.category,
         "data": doc.data
     } if doc else None
 
+def get_document_blob_key(db: Session, doc_id: int) -> Optional[str]:
+    """Blob key of a document's original file; raises LookupError if the document does not exist"""
+    row = db.query(Document.blob_key).filter(Document.id == doc_id).first()
+    if row is None:
+        raise LookupError(f"Document {doc_id} not found")
+    return row.blob_key
+
 def update_document_by_id(db: Session, doc_id: int, updated_doc):
     doc = db.query(Document).filter(Document.id == doc_id).first()
     if not doc:
         return {"error": "Document not found"}
+    deltas = _stats_delta({}, doc.receipt_date, doc.vendor, doc.category, doc.amount, -1)
     doc.vendor = updated_doc.vendor
     doc.amount = updated_doc.amount
     doc.category = updated_doc.category
     doc.data = updated_doc.data
-    doc.created_at = datetime.strptime(updated_doc.date, '%Y-%m-%d')
+    doc.receipt_date = datetime.strptime(updated_doc.date, '%Y-%m-%d').date()
+    doc.extractor_version = MANUAL_EXTRACTOR_VERSION
+    _apply_stats_deltas(db, _stats_delta(deltas, doc.receipt_date, doc.vendor, doc.category, doc.amount, 1))
     db.commit()
+    _bump_documents_version()
     db.refresh(doc)
     return {"message": "Document updated successfully", "id": doc.id}
 
@@ -121,11 +572,28 @@ def delete_document_by_id(db: Session, doc_id: int):
     doc = db.query(Document).filter(Document.id == doc_id).first()
     if not doc:
         return {"error": "Document not found"}
+    _apply_stats_deltas(db, _stats_delta({}, doc.receipt_date, doc.vendor, doc.category, doc.amount, -1))
     db.delete(doc)
     db.commit()
+    _bump_documents_version()
     return {"message": f"Document ID {doc_id} deleted successfully"}
 
 
+def vendor_category_map(db: Session) -> dict:
+    """Most frequent category for each vendor, used to seed the rule-based extractor"""
+    rows = (
+        db.query(Document.vendor, Document.category, func.count(Document.id))
+        .filter(Document.vendor.isnot(None), Document.category.isnot(None))
+        .group_by(Document.vendor, Document.category)
+        .all()
+    )
+    best = {}
+    for vendor, category, count in rows:
+        if vendor not in best or count > best[vendor][1]:
+            best[vendor] = (category, count)
+    return {vendor: category for vendor, (category, _) in best.items()}
+
+
 # def filter_documents(db: Session, filters: DocumentFilter) -> List[dict]:
 #     query = db.query(Document)
 #     conditions = []
@@ -161,33 +629,85 @@ def delete_document_by_id(db: Session, doc_id: int):
 #         {
 #             "id": doc.id,
 #             "vendor": doc.vendor,
-#             "date": doc.created_at.strftime("%Y-%m-%d"),
+#             "date": doc.receipt_date.strftime("%Y-%m-%d"),
 #             "amount": float(doc.amount),
 #             "category": doc.category
 #         }
 #         for doc in results
 #     ]
 
-def filter_documents(
-    db: Session,
-    filters: DocumentFilter,
-    offset: int = 0,
-    limit: int = 2000
-) -> dict:
-    query = db.query(Document)
+def _prefix_match(column, value: str):
+    """Case-insensitive prefix match on a normalized column, written as a range so it can use an index"""
+    prefix = normalize_label(value)
+    return and_(column >= prefix, column < prefix + "\uffff")
+
+# Full-text index (SQLite FTS5, external content kept in sync by triggers). ocr_text is stored
+# compressed, so the triggers index inflate_text(ocr_text); for the same reason the index must be
+# refilled with FTS_FILL rather than FTS5's 'rebuild', which would read the compressed bytes
+fts_table = table("documents_fts", column("rowid"))
+documents_fts = literal_column("documents_fts")
+
+FTS_COLUMNS = ("vendor", "category", "data", "ocr_text")
+FTS_SETUP = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5("
+    "vendor, category, data, ocr_text, content='documents', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS documents_fts_ai AFTER INSERT ON documents BEGIN "
+    "INSERT INTO documents_fts(rowid, vendor, category, data, ocr_text) "
+    "VALUES (new.id, new.vendor, new.category, new.data, inflate_text(new.ocr_text)); END",
+    "CREATE TRIGGER IF NOT EXISTS documents_fts_ad AFTER DELETE ON documents BEGIN "
+    "INSERT INTO documents_fts(documents_fts, rowid, vendor, category, data, ocr_text) "
+    "VALUES ('delete', old.id, old.vendor, old.category, old.data, inflate_text(old.ocr_text)); END",
+    # Only when an indexed column is written, so amount/date edits do not decompress the OCR text
+    "CREATE TRIGGER IF NOT EXISTS documents_fts_au AFTER UPDATE OF vendor, category, data, ocr_text ON documents BEGIN "
+    "INSERT INTO documents_fts(documents_fts, rowid, vendor, category, data, ocr_text) "
+    "VALUES ('delete', old.id, old.vendor, old.category, old.data, inflate_text(old.ocr_text)); "
+    "INSERT INTO documents_fts(rowid, vendor, category, data, ocr_text) "
+    "VALUES (new.id, new.vendor, new.category, new.data, inflate_text(new.ocr_text)); END",
+]
+FTS_FILL = (
+    "INSERT INTO documents_fts(rowid, vendor, category, data, ocr_text) "
+    "SELECT id, vendor, category, data, inflate_text(ocr_text) FROM documents"
+)
+
+def _fts_enabled() -> bool:
+    return engine.dialect.name == "sqlite"
+
+def _search_terms(q: Optional[str]) -> List[str]:
+    return re.findall(r"\w+", q or "")
+
+def _fts_query(q: str) -> str:
+    """Turn free text into an FTS5 query: every word must match, as a prefix"""
+    return " ".join(f'"{term}"*' for term in _search_terms(q))
+
+def _search_condition(q: str):
+    if _fts_enabled():
+        matches = select(fts_table.c.rowid).where(
+            documents_fts.op("MATCH")(_fts_query(q))
+        )
+        return Document.id.in_(matches)
+    # Other databases: every word must appear in the vendor or the stored text
+    return and_(*(
+        or_(Document.vendor.ilike(f"%{term}%"), Document.data.ilike(f"%{term}%"))
+        for term in _search_terms(q)
+    ))
+
+def _filter_conditions(filters: DocumentFilter, include_search: bool = True) -> list:
     conditions = []
 
+    if include_search and _search_terms(filters.q):
+        conditions.append(_search_condition(filters.q))
+
     if filters.vendor and filters.vendor.strip():
-        conditions.append(Document.vendor.ilike(f"%{filters.vendor.strip()}%"))
+        conditions.append(_prefix_match(Document.vendor_norm, filters.vendor))
 
     if filters.category and filters.category.strip():
-        conditions.append(Document.category.ilike(f"%{filters.category.strip()}%"))
+        conditions.append(Document.category_norm == normalize_label(filters.category))
 
     if filters.startDate:
-        conditions.append(Document.created_at >= filters.startDate)
+        conditions.append(Document.receipt_date >= filters.startDate)
 
     if filters.endDate:
-        conditions.append(Document.created_at <= filters.endDate)
+        conditions.append(Document.receipt_date <= filters.endDate)
 
     if filters.minAmount is not None:
         conditions.append(Document.amount >= filters.minAmount)
@@ -195,26 +715,339 @@ def filter_documents(
     if filters.maxAmount is not None:
         conditions.append(Document.amount <= filters.maxAmount)
 
+    return conditions
+
+def has_filters(filters: DocumentFilter) -> bool:
+    """False when the filter matches every document (no field set, or only blank ones)"""
+    return bool(_filter_conditions(filters))
+
+def _count_cache_key(filters: DocumentFilter) -> tuple:
+    return filters.model_dump_json(), _documents_version
+
+def _cached_count(query, filters: DocumentFilter) -> int:
+    """COUNT(*) for a filter, reused until the next write (or for COUNT_CACHE_TTL seconds)"""
+    key = _count_cache_key(filters)
+    now = time.monotonic()
+    cached = _count_cache.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+    total_count = query.count()
+    if len(_count_cache) >= COUNT_CACHE_MAX_ENTRIES:
+        _count_cache.clear()
+    _count_cache[key] = (now + COUNT_CACHE_TTL, total_count)
+    return total_count
+
+def filter_documents(
+    db: Session,
+    filters: DocumentFilter,
+    offset: int = 0,
+    limit: int = 2000,
+    cursor: Optional[str] = None,
+    include_total: bool = True
+) -> dict:
+    """Filtered page of documents.
+
+    With `cursor` (from a previous `next_cursor`) the page is fetched by keyset
+    instead of OFFSET, so deep pages cost the same as the first one. The total
+    count is optional and cached per filter until the next write.
+
+    With `filters.q` results are ranked by relevance and carry a highlighted
+    `snippet`; their cursors encode an offset.
+    """
+    if _search_terms(filters.q) and _fts_enabled():
+        if cursor:
+            offset = decode_offset_cursor(cursor)
+        return _search_documents(db, filters, offset, limit, include_total)
+
+    query = db.query(Document)
+    conditions = _filter_conditions(filters)
+
     if conditions:
         query = query.filter(and_(*conditions))
 
-    total_count = query.count()
-    docs = query.order_by(Document.created_at.desc()).offset(offset).limit(limit).all()
+    total_count = _cached_count(query, filters) if include_total else None
+    if cursor is not None:
+        docs, next_cursor = _keyset_page(query, cursor, limit)
+    else:
+        docs, next_cursor = _keyset_page(query, None, limit, offset)
 
     return {
         "results": [
             {
                 "id": doc.id,
                 "vendor": doc.vendor,
-                "date": doc.created_at.strftime("%Y-%m-%d"),
+                "date": doc.receipt_date.strftime("%Y-%m-%d"),
                 "amount": float(doc.amount),
                 "category": doc.category
             }
             for doc in docs
         ],
-        "total": total_count
+        "total": total_count,
+        "next_cursor": next_cursor
     }
 
 
+def _search_documents(db: Session, filters: DocumentFilter, offset: int, limit: int, include_total: bool) -> dict:
+    """Full-text search joined to the regular filters, best matches first"""
+    snippet = func.snippet(documents_fts, 2, "<mark>", "</mark>", "…", 12)
+    query = (
+        db.query(Document, snippet)
+        .join(fts_table, fts_table.c.rowid == Document.id)
+        .filter(documents_fts.op("MATCH")(_fts_query(filters.q)))
+    )
+    conditions = _filter_conditions(filters, include_search=False)
+    if conditions:
+        query = query.filter(and_(*conditions))
+
+    total_count = _cached_count(query, filters) if include_total else None
+    rows = query.order_by(func.bm25(documents_fts), Document.id.desc()).offset(offset).limit(limit).all()
+
+    return {
+        "results": [
+            {
+                "id": doc.id,
+                "vendor": doc.vendor,
+                "date": doc.receipt_date.strftime("%Y-%m-%d"),
+                "amount": float(doc.amount),
+                "category": doc.category,
+                "snippet": doc_snippet
+            }
+            for doc, doc_snippet in rows
+        ],
+        "total": total_count,
+        "next_cursor": encode_offset_cursor(offset + limit) if len(rows) == limit else None
+    }
+
+def has_filtered_documents(db: Session, filters: DocumentFilter) -> bool:
+    conditions = _filter_conditions(filters)
+    query = db.query(Document.id)
+    if conditions:
+        query = query.filter(and_(*conditions))
+    return db.query(query.exists()).scalar()
+
+def iter_filtered_documents(db: Session, filters: DocumentFilter, chunk_size: int = 1000):
+    """Yield export rows matching the filters, fetched from the DB `chunk_size` at a time"""
+    conditions = _filter_conditions(filters)
+    query = db.query(Document.vendor, Document.receipt_date, Document.amount, Document.category)
+    if conditions:
+        query = query.filter(and_(*conditions))
+    query = query.order_by(Document.receipt_date.desc(), Document.id.desc())
+    query = query.execution_options(stream_results=True).yield_per(chunk_size)
+    for vendor, receipt_date, amount, category in query:
+        yield {
+            "vendor": vendor,
+            "date": receipt_date.strftime("%Y-%m-%d"),
+            "amount": float(amount),
+            "category": category
+        }
+
+
+def _export_conditions(filters: DocumentFilter, since: Optional[datetime], until: Optional[datetime]) -> list:
+    conditions = _filter_conditions(filters)
+    if since is not None:
+        conditions.append(Document.updated_at > since)
+    if until is not None:
+        conditions.append(Document.updated_at <= until)
+    return conditions
+
+def export_watermark(db: Session, filters: DocumentFilter, since: Optional[datetime] = None) -> Optional[datetime]:
+    """Latest updated_at among the rows an export would include (None if there are none).
+
+    Exports are bounded by it, so a client that passes it back as `since` next
+    time gets exactly the rows written in between.
+    """
+    value = db.query(func.max(Document.updated_at)).filter(*_export_conditions(filters, since, None)).scalar()
+    # MAX() over a DateTime column comes back as text on SQLite
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+def iter_export_chunks(db: Session, filters: DocumentFilter, chunk_size: int = 65536,
+                       since: Optional[datetime] = None, until: Optional[datetime] = None):
+    """Yield lists of (id, vendor, receipt_date, amount, category, updated_at) tuples, `chunk_size`
+    rows at a time, in receipt_date order so rows of the same month are contiguous"""
+    stmt = (
+        select(Document.id, Document.vendor, Document.receipt_date, Document.amount, Document.category, Document.updated_at)
+        .where(*_export_conditions(filters, since, until))
+        .order_by(Document.receipt_date.desc(), Document.id.desc())
+        .execution_options(yield_per=chunk_size)
+    )
+    for partition in db.execute(stmt).partitions():
+        yield [tuple(row) for row in partition]
+
+def _stats_source(filters: DocumentFilter):
+    """(day, vendor, category, total, count, conditions) columns to aggregate over.
+
+    Uses the daily summary table unless an amount filter or text search requires per-document rows.
+    """
+    if filters.minAmount is None and filters.maxAmount is None and not _search_terms(filters.q):
+        conditions = []
+        if filters.vendor and filters.vendor.strip():
+            conditions.append(_prefix_match(DailyStat.vendor_norm, filters.vendor))
+        if filters.category and filters.category.strip():
+            conditions.append(DailyStat.category_norm == normalize_label(filters.category))
+        if filters.startDate:
+            conditions.append(DailyStat.day >= filters.startDate)
+        if filters.endDate:
+            conditions.append(DailyStat.day <= filters.endDate)
+        return (DailyStat.day, DailyStat.vendor, DailyStat.category,
+                func.sum(DailyStat.total), func.sum(DailyStat.count), conditions)
+    return (Document.receipt_date, Document.vendor, Document.category,
+            func.sum(Document.amount), func.count(Document.id), _filter_conditions(filters))
+
+def _grouped_totals(db: Session, filters: DocumentFilter, group_by: str) -> List[tuple]:
+    day, vendor, category, total, count, conditions = _stats_source(filters)
+    column = {"day": day, "vendor": vendor, "category": category}[group_by]
+    query = db.query(column, total, count)
+    if conditions:
+        query = query.filter(and_(*conditions))
+    return query.group_by(column).all()
+
+def _stats_rows(rows) -> List[dict]:
+    merged = {}
+    for name, total, count in rows:
+        name = name or "Uncategorized"
+        prev_total, prev_count = merged.get(name, (0.0, 0))
+        merged[name] = (prev_total + float(total or 0), prev_count + int(count or 0))
+    return sorted(
+        ({"name": name, "total": round(total, 2), "count": count} for name, (total, count) in merged.items()),
+        key=lambda row: row["total"],
+        reverse=True
+    )
+
+def stats_by_category(db: Session, filters: DocumentFilter) -> List[dict]:
+    return _stats_rows(_grouped_totals(db, filters, "category"))
+
+def stats_by_vendor(db: Session, filters: DocumentFilter, limit: Optional[int] = None) -> List[dict]:
+    rows = _stats_rows(_grouped_totals(db, filters, "vendor"))
+    return rows[:limit] if limit else rows
+
+def stats_by_period(db: Session, filters: DocumentFilter, period: str = "month") -> List[dict]:
+    """Totals per day, week (starting Monday) or month, in chronological order"""
+    if period not in ("day", "week", "month"):
+        raise ValueError(f"Invalid period: {period}")
+    buckets = {}
+    for day_value, total, count in _grouped_totals(db, filters, "day"):
+        if isinstance(day_value, str):
+            day_value = date.fromisoformat(day_value)
+        if period == "week":
+            day_value = day_value - timedelta(days=day_value.weekday())
+        elif period == "month":
+            day_value = day_value.replace(day=1)
+        prev_total, prev_count = buckets.get(day_value, (0.0, 0))
+        buckets[day_value] = (prev_total + float(total or 0), prev_count + int(count or 0))
+    return [
+        {"period": key.isoformat(), "total": round(total, 2), "count": count}
+        for key, (total, count) in sorted(buckets.items())
+    ]
+
+
+def explain_filter_plan(db: Session, filters: DocumentFilter, limit: int = 20, cursor: Optional[str] = None) -> List[str]:
+    """SQLite query plan for a filter_documents page, e.g. to check that filters hit an index"""
+    query = db.query(Document)
+    conditions = _filter_conditions(filters)
+    if cursor:
+        conditions.append(_after_cursor(cursor))
+    if conditions:
+        query = query.filter(and_(*conditions))
+    query = query.order_by(Document.receipt_date.desc(), Document.id.desc()).limit(limit)
+    compiled = query.statement.compile(dialect=db.bind.dialect, compile_kwargs={"literal_binds": True})
+    return [row[-1] for row in db.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all()]
+
+def _backfill_normalized_labels(conn, batch_size: int = 1000):
+    """Fill vendor_norm / category_norm with normalize_label, the same function new rows go through
+    (SQL LOWER/TRIM differ from str.lower/strip on non-ASCII text and whitespace), in id-ordered batches"""
+    table = Document.__table__
+    stmt = sa_update(table).where(table.c.id == bindparam("doc_id")).values(
+        vendor_norm=bindparam("vendor_norm"), category_norm=bindparam("category_norm")
+    )
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(table.c.id, table.c.vendor, table.c.category)
+            .where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        conn.execute(stmt, [
+            {"doc_id": row.id, "vendor_norm": normalize_label(row.vendor), "category_norm": normalize_label(row.category)}
+            for row in rows
+        ])
+        last_id = rows[-1].id
+
+def _backfill_stat_keys(conn):
+    """Fill the normalized keys of existing summary buckets, one UPDATE per distinct vendor/category pair"""
+    table = DailyStat.__table__
+    pairs = conn.execute(select(table.c.vendor, table.c.category).distinct()).all()
+    if pairs:
+        conn.execute(
+            sa_update(table)
+            .where(table.c.vendor == bindparam("old_vendor"), table.c.category == bindparam("old_category"))
+            .values(vendor_norm=bindparam("vendor_norm"), category_norm=bindparam("category_norm")),
+            [
+                {"old_vendor": vendor, "old_category": category,
+                 "vendor_norm": normalize_label(vendor), "category_norm": normalize_label(category)}
+                for vendor, category in pairs
+            ],
+        )
+
+def migrate_schema(bind):
+    """Bring an existing database up to the current schema.
+
+    Adds the receipt_date / vendor_norm / category_norm / blob_key / ocr_text /
+    extractor_version / updated_at columns to older `documents` tables, backfills
+    the first three (older rows stored the receipt date in created_at) and
+    updated_at (from created_at), adds and fills the normalized vendor/category
+    keys of the daily summary table, creates any missing indexes and, on
+    SQLite, the FTS5 search index with its sync triggers. Safe to run repeatedly.
+    """
+    existing = {column["name"] for column in inspect(bind).get_columns("documents")}
+    added = []
+    with bind.begin() as conn:
+        for column in (
+            Document.receipt_date, Document.vendor_norm, Document.category_norm, Document.blob_key,
+            Document.ocr_text, Document.extractor_version, Document.updated_at,
+        ):
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=bind.dialect)
+                conn.execute(text(f"ALTER TABLE documents ADD COLUMN {column.name} {column_type}"))
+                added.append(column.name)
+        if "receipt_date" in added:
+            conn.execute(text("UPDATE documents SET receipt_date = DATE(created_at) WHERE receipt_date IS NULL"))
+        if "vendor_norm" in added or "category_norm" in added:
+            _backfill_normalized_labels(conn)
+        if "updated_at" in added:
+            conn.execute(text("UPDATE documents SET updated_at = created_at WHERE updated_at IS NULL"))
+        conn.execute(text("DROP INDEX IF EXISTS idx_created_at_id"))
+        stat_columns = {column["name"] for column in inspect(conn).get_columns(DailyStat.__tablename__)}
+        stat_keys_added = False
+        for column in (DailyStat.vendor_norm, DailyStat.category_norm):
+            if column.name not in stat_columns:
+                column_type = column.type.compile(dialect=bind.dialect)
+                conn.execute(text(f"ALTER TABLE {DailyStat.__tablename__} ADD COLUMN {column.name} {column_type}"))
+                stat_keys_added = True
+        if stat_keys_added:
+            _backfill_stat_keys(conn)
+        conn.execute(text("DROP INDEX IF EXISTS idx_daily_stats_category"))
+        if bind.dialect.name == "sqlite":
+            fts_columns = tuple(row[1] for row in conn.execute(text("PRAGMA table_info(documents_fts)")))
+            if fts_columns and fts_columns != FTS_COLUMNS:
+                # Indexed columns changed: drop the old index and its triggers and build it again
+                for trigger in ("documents_fts_ai", "documents_fts_ad", "documents_fts_au"):
+                    conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+                conn.execute(text("DROP TABLE documents_fts"))
+            for statement in FTS_SETUP:
+                conn.execute(text(statement))
+            if fts_columns != FTS_COLUMNS:
+                conn.execute(text(FTS_FILL))
+    # create_all skips existing tables, so add indexes introduced since the table was created
+    for index in (*Document.__table__.indexes, *DailyStat.__table__.indexes):
+        index.create(bind=bind, checkfirst=True)
+
+
 # Create DB on startup
 Base.metadata.create_all(bind=engine)
+migrate_schema(engine)
+
+# Backfill the summary table for databases created before it existed
+with SessionLocal() as _session:
+    if _session.query(DailyStat.day).first() is None and _session.query(Document.id).first() is not None:
+        rebuild_daily_stats(_session)
@@ -0,0 +1,167 @@
+# db_async.py
+"""Async access to the documents database for the request path.
+
+With DB_ASYNC_ENABLED the CRUD and listing endpoints use SQLAlchemy's asyncio
+engine (aiosqlite for SQLite, asyncpg for PostgreSQL), so a request waiting on
+the database holds no threadpool thread. The queries themselves live in db.py:
+each function here hands its sync counterpart to AsyncSession.run_sync, which
+runs it on the event loop and awaits the driver on every round trip, so both
+paths share filters, cursors, summary-table upkeep and cache invalidation.
+
+With it disabled the same functions run the sync versions on the threadpool,
+which is what the sync endpoints did.
+"""
+import threading
+from functools import partial
+from typing import List, Optional
+
+from anyio import to_thread
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+import db as sync_db
+from config import (
+    ASYNC_DATABASE_URL,
+    DATABASE_URL,
+    DB_ASYNC_ENABLED,
+    DB_MAX_OVERFLOW,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    SQL_ECHO,
+)
+from db import DocumentFilter
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def async_database_url(url: str = DATABASE_URL) -> str:
+    """DATABASE_URL with its async driver swapped in (ASYNC_DATABASE_URL wins when set)"""
+    if ASYNC_DATABASE_URL:
+        return ASYNC_DATABASE_URL
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver configured for {url.get_backend_name()} (set ASYNC_DATABASE_URL)")
+    return url.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def _create_async_engine(url: str):
+    try:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        import greenlet  # noqa: F401  (needed by every async engine)
+    except ImportError as e:
+        raise RuntimeError("DB_ASYNC_ENABLED needs greenlet and aiosqlite or asyncpg (pip install greenlet aiosqlite)") from e
+    url = make_url(url)
+    options = {"echo": SQL_ECHO, "pool_pre_ping": True}
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        raise ValueError("The async path needs a file or server database; an in-memory SQLite database is per connection")
+    # Only queue pools take sizing options; aiosqlite on SQLAlchemy 2.0 uses NullPool for file databases
+    if issubclass(url.get_dialect().get_pool_class(url), QueuePool):
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    engine = create_async_engine(url, **options)
+    if engine.dialect.name == "sqlite":
+        sync_db._install_sqlite_hooks(engine.sync_engine)
+    return engine
+
+
+class _AsyncDatabase:
+    """Engine and session factories, created on first use so the sync-only path never imports the drivers"""
+
+    def __init__(self):
+        self.engine = None
+        self.session = None
+        self.write_session = None
+        self._lock = threading.Lock()
+
+    def ensure(self):
+        if self.engine is None:
+            with self._lock:
+                if self.engine is None:
+                    from sqlalchemy.ext.asyncio import async_sessionmaker
+                    engine = _create_async_engine(async_database_url())
+                    # expire_on_commit=False: results are read after the commit without another round trip
+                    self.session = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+                    self.write_session = async_sessionmaker(
+                        bind=engine.execution_options(sqlite_begin="IMMEDIATE"), autoflush=False, expire_on_commit=False
+                    )
+                    self.engine = engine
+        return self
+
+
+_database = _AsyncDatabase()
+
+
+async def dispose_async_engine():
+    if _database.engine is not None:
+        await _database.engine.dispose()
+
+
+# Dependencies for FastAPI: an AsyncSession when enabled, otherwise a sync Session used from the threadpool
+async def get_async_db():
+    if not DB_ASYNC_ENABLED:
+        db = sync_db.SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+        return
+    async with _database.ensure().session() as db:
+        yield db
+
+
+async def get_async_write_db():
+    if not DB_ASYNC_ENABLED:
+        db = sync_db.WriteSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+        return
+    async with _database.ensure().write_session() as db:
+        yield db
+
+
+async def _run(db, fn, *args):
+    if isinstance(db, Session):
+        return await to_thread.run_sync(partial(fn, db, *args))
+    return await db.run_sync(fn, *args)
+
+
+# Reads
+async def get_all_documents(db, offset: int = 0, limit: int = 50) -> List[dict]:
+    return await _run(db, sync_db.get_all_documents, offset, limit)
+
+
+async def get_documents_page(db, cursor: Optional[str] = None, limit: int = 50):
+    return await _run(db, sync_db.get_documents_page, cursor, limit)
+
+
+async def get_document_by_id(db, doc_id: int) -> Optional[dict]:
+    return await _run(db, sync_db.get_document_by_id, doc_id)
+
+
+async def filter_documents(db, filters: DocumentFilter, offset: int = 0, limit: int = 2000,
+                           cursor: Optional[str] = None, include_total: bool = True) -> dict:
+    return await _run(db, sync_db.filter_documents, filters, offset, limit, cursor, include_total)
+
+
+# Writes (commit, summary-table deltas and the documents version bump happen in the sync function)
+async def insert(db, vendor: str, data: str, amount: float, category: str, date: str, **kwargs):
+    return await _run(db, partial(sync_db.insert, **kwargs), vendor, data, amount, category, date)
+
+
+async def bulk_insert(db, rows: List[dict]) -> List[int]:
+    return await _run(db, sync_db.bulk_insert, rows)
+
+
+async def bulk_update(db, filters: DocumentFilter, values: dict) -> int:
+    return await _run(db, sync_db.bulk_update, filters, values)
+
+
+async def update_document_by_id(db, doc_id: int, updated_doc) -> dict:
+    return await _run(db, sync_db.update_document_by_id, doc_id, updated_doc)
+
+
+async def delete_document_by_id(db, doc_id: int) -> dict:
+    return await _run(db, sync_db.delete_document_by_id, doc_id)
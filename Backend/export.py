@@ -0,0 +1,236 @@
+# export.py
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from config import ARROW_IPC_COMPRESSION, PARQUET_COMPRESSION
+
+EXPORT_FIELDS = ["vendor", "date", "amount", "category"]
+ROWS_PER_CHUNK = 1000
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def iter_csv(rows: Iterable[Dict]) -> Iterator[bytes]:
+    """Encode rows as CSV, yielding a chunk every ROWS_PER_CHUNK rows"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def iter_json_array(rows: Iterable[Dict]) -> Iterator[bytes]:
+    """Encode rows as a single JSON array without building it in memory"""
+    parts = ["["]
+    for i, row in enumerate(rows):
+        parts.append(("," if i else "") + json.dumps({k: row[k] for k in EXPORT_FIELDS}))
+        if len(parts) >= ROWS_PER_CHUNK:
+            yield "".join(parts).encode("utf-8")
+            parts = []
+    parts.append("]")
+    yield "".join(parts).encode("utf-8")
+
+
+def iter_ndjson(rows: Iterable[Dict]) -> Iterator[bytes]:
+    """Encode rows as newline-delimited JSON"""
+    parts = []
+    for row in rows:
+        parts.append(json.dumps({k: row[k] for k in EXPORT_FIELDS}) + "\n")
+        if len(parts) >= ROWS_PER_CHUNK:
+            yield "".join(parts).encode("utf-8")
+            parts = []
+    yield "".join(parts).encode("utf-8")
+
+
+def iter_xlsx(rows: Iterable[Dict]) -> Iterator[bytes]:
+    """Write rows with openpyxl's constant-memory write-only mode, then stream the file"""
+    from openpyxl import Workbook
+
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(EXPORT_FIELDS)
+        for row in rows:
+            sheet.append([row[k] for k in EXPORT_FIELDS])
+        workbook.save(path)
+        with open(path, "rb") as f:
+            while chunk := f.read(FILE_CHUNK_SIZE):
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+# format -> (encoder, media type, file extension)
+EXPORT_FORMATS = {
+    "csv": (iter_csv, "text/csv", "csv"),
+    "json": (iter_json_array, "application/json", "json"),
+    "ndjson": (iter_ndjson, "application/x-ndjson", "ndjson"),
+    "excel": (iter_xlsx, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+}
+
+
+# Columnar exports: chunks of (id, vendor, date, amount, category, updated_at) tuples
+# from db.iter_export_chunks become typed Arrow record batches. pyarrow is optional.
+HIVE_DEFAULT_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+def columnar_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise RuntimeError("Parquet and Arrow exports need pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+
+def arrow_schema():
+    pa = _pyarrow()
+    return pa.schema([
+        ("id", pa.int64()),
+        ("vendor", pa.string()),
+        ("date", pa.date32()),
+        ("amount", pa.decimal128(12, 2)),
+        ("category", pa.string()),
+        ("updated_at", pa.timestamp("us")),
+    ])
+
+
+def to_record_batch(rows: List[tuple], schema):
+    pa = _pyarrow()
+    columns = list(zip(*rows)) if rows else [() for _ in schema]
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+    )
+
+
+class _StreamSink(io.RawIOBase):
+    """Write-only file object whose contents are handed out as they are written, so
+    pyarrow and zipfile output can be streamed instead of built up in memory"""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def _parquet_writer(where, schema):
+    import pyarrow.parquet as pq
+    return pq.ParquetWriter(where, schema, compression=PARQUET_COMPRESSION)
+
+
+def _arrow_writer(where, schema):
+    pa = _pyarrow()
+    compression = None if ARROW_IPC_COMPRESSION.lower() in ("", "none") else ARROW_IPC_COMPRESSION
+    return pa.ipc.new_file(where, schema, options=pa.ipc.IpcWriteOptions(compression=compression))
+
+
+def _month(day) -> str:
+    return f"{day.year:04d}-{day.month:02d}" if day else HIVE_DEFAULT_PARTITION
+
+
+def _month_runs(chunks: Iterable[List[tuple]]) -> Iterator[tuple]:
+    """Split chunks into (month, rows) runs; chunks arrive in date order, so each month is contiguous"""
+    for rows in chunks:
+        start = 0
+        for i in range(1, len(rows) + 1):
+            if i == len(rows) or _month(rows[i][2]) != _month(rows[start][2]):
+                yield _month(rows[start][2]), rows[start:i]
+                start = i
+
+
+def _iter_columnar(chunks: Iterable[List[tuple]], open_writer) -> Iterator[bytes]:
+    schema = arrow_schema()
+    sink = _StreamSink()
+    with open_writer(sink, schema) as writer:
+        for rows in chunks:
+            writer.write_batch(to_record_batch(rows, schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def _iter_partitioned(chunks: Iterable[List[tuple]], open_writer, extension: str) -> Iterator[bytes]:
+    """Zip of Hive-style `month=YYYY-MM/part-0.<ext>` files. Months are written one at a
+    time to a temporary file, then added to the archive, which streams as it grows."""
+    schema = arrow_schema()
+    sink = _StreamSink()
+    spool_dir = tempfile.mkdtemp(prefix="export-")
+    writer = None
+    try:
+        # Members are already compressed, so store them as-is
+        with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+            month = None
+            for run_month, rows in _month_runs(chunks):
+                if run_month != month:
+                    if writer is not None:
+                        writer.close()
+                        writer = None
+                        archive.write(os.path.join(spool_dir, f"part.{extension}"), f"month={month}/part-0.{extension}")
+                        yield sink.drain()
+                    month = run_month
+                    writer = open_writer(os.path.join(spool_dir, f"part.{extension}"), schema)
+                writer.write_batch(to_record_batch(rows, schema))
+            if writer is not None:
+                writer.close()
+                writer = None
+                archive.write(os.path.join(spool_dir, f"part.{extension}"), f"month={month}/part-0.{extension}")
+        yield sink.drain()
+    finally:
+        if writer is not None:
+            writer.close()
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+
+def iter_parquet(chunks: Iterable[List[tuple]], partition_by: Optional[str] = None) -> Iterator[bytes]:
+    """Compressed Parquet, one row group per chunk; `partition_by="month"` gives a zip of monthly files"""
+    if partition_by == "month":
+        return _iter_partitioned(chunks, _parquet_writer, "parquet")
+    return _iter_columnar(chunks, _parquet_writer)
+
+
+def iter_arrow(chunks: Iterable[List[tuple]], partition_by: Optional[str] = None) -> Iterator[bytes]:
+    """Arrow IPC file (Feather v2) with compressed buffers; `partition_by="month"` gives a zip of monthly files"""
+    if partition_by == "month":
+        return _iter_partitioned(chunks, _arrow_writer, "arrow")
+    return _iter_columnar(chunks, _arrow_writer)
+
+
+# format -> (encoder, media type, file extension); encoders take row chunks and a partition_by
+COLUMNAR_FORMATS = {
+    "parquet": (iter_parquet, "application/vnd.apache.parquet", "parquet"),
+    "arrow": (iter_arrow, "application/vnd.apache.arrow.file", "arrow"),
+}
+PARTITION_KEYS = ("month",)
@@ -0,0 +1,104 @@
+# jobs.py
+import threading
+import time
+import uuid
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from enum import Enum
+from typing import Callable, Dict, Optional
+
+from config import JOB_WORKERS, JOB_HISTORY_LIMIT
+from metrics import JOB_SECONDS, JOB_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class JobQueue:
+    """In-process job queue backed by a thread pool.
+
+    Jobs run off the event loop; their state is kept in memory so it can be
+    polled by id. Only the most recent `history_limit` finished jobs are retained.
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS, history_limit: int = JOB_HISTORY_LIMIT):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.history_limit = history_limit
+
+    def submit(self, fn: Callable, *args, kind: str = "upload", **kwargs) -> str:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = {
+                "id": job_id,
+                "kind": kind,
+                "status": JobStatus.QUEUED,
+                "created_at": datetime.utcnow().isoformat(),
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+                "error": None,
+            }
+            self._trim()
+        self._executor.submit(self._run, job_id, kind, time.perf_counter(), fn, args, kwargs)
+        return job_id
+
+    def _run(self, job_id: str, kind: str, queued_at: float, fn: Callable, args, kwargs):
+        started = time.perf_counter()
+        JOB_WAIT_SECONDS.observe(started - queued_at, kind=kind)
+        self._update(job_id, status=JobStatus.RUNNING, started_at=datetime.utcnow().isoformat())
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            logger.exception(f"Job {job_id} failed")
+            JOB_SECONDS.observe(time.perf_counter() - started, kind=kind, status=JobStatus.FAILED.value)
+            self._update(job_id, status=JobStatus.FAILED, error=str(e), finished_at=datetime.utcnow().isoformat())
+        else:
+            JOB_SECONDS.observe(time.perf_counter() - started, kind=kind, status=JobStatus.SUCCEEDED.value)
+            self._update(job_id, status=JobStatus.SUCCEEDED, result=result, finished_at=datetime.utcnow().isoformat())
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def _trim(self):
+        # Drop the oldest finished jobs once the history limit is exceeded
+        excess = len(self._jobs) - self.history_limit
+        if excess <= 0:
+            return
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id]["status"] in (JobStatus.SUCCEEDED, JobStatus.FAILED):
+                del self._jobs[job_id]
+                excess -= 1
+
+    def status_counts(self) -> Dict[str, int]:
+        """Number of retained jobs per status"""
+        with self._lock:
+            counts = {status.value: 0 for status in JobStatus}
+            for job in self._jobs.values():
+                counts[job["status"].value] += 1
+            return counts
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+job_queue = JobQueue()
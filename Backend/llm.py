@@ -0,0 +1,321 @@
+# llm.py
+import asyncio
+import logging
+import random
+import re
+import threading
+import time
+from typing import Callable, List, Optional, Sequence, Union
+
+from config import (
+    GROQ_API_KEY,
+    LLM_BACKEND,
+    LLM_MODEL,
+    LLM_MAX_CONCURRENCY,
+    LLM_RATE_PER_MINUTE,
+    LLM_RATE_BURST,
+    LLM_TIMEOUT_S,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_S,
+    LLM_RETRY_MAX_S,
+)
+from metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+LLM_REQUESTS = Counter("llm_requests_total", "LLM calls by outcome (retries count once per attempt).", ["outcome"])
+
+# HTTP statuses worth retrying: rate limited, or the provider is having a bad moment
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMBackend:
+    """A chat model that turns one prompt into one completion.
+
+    Subclasses implement `acomplete`; `model_name` is part of the parse-cache key,
+    so changing the model never serves answers produced by another one.
+    """
+
+    model_name = "unknown"
+
+    async def acomplete(self, prompt: str) -> str:
+        raise NotImplementedError
+
+
+class RunnableBackend(LLMBackend):
+    """Any LangChain chat model or runnable, called through its async API"""
+
+    def __init__(self, runnable):
+        self.runnable = runnable
+        self.model_name = getattr(runnable, "model_name", None) or type(runnable).__name__
+
+    async def acomplete(self, prompt: str) -> str:
+        response = await self.runnable.ainvoke(prompt)
+        return response.content if hasattr(response, "content") else str(response)
+
+
+class GroqBackend(RunnableBackend):
+    """Groq-hosted model; the client (and its HTTP connection pool) is created once and reused"""
+
+    def __init__(self, model: str = LLM_MODEL, api_key: Optional[str] = GROQ_API_KEY):
+        from pydantic import SecretStr
+        from langchain_groq import ChatGroq
+        # Retries and timeouts are handled by LLMClient so they are applied uniformly
+        super().__init__(ChatGroq(model=model, api_key=SecretStr(api_key or ""), stop_sequences=[], max_retries=0))
+        self.model_name = model
+
+
+class LocalBackend(LLMBackend):
+    """Offline stand-in for tests and benchmarks: answers after a configurable delay.
+
+    `answer(prompt)` produces the completion; by default the rule-based receipt
+    extractor fills in the tags the receipt prompts ask for, including packed prompts.
+    """
+
+    model_name = "local"
+
+    def __init__(self, answer: Optional[Callable[[str], str]] = None, latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0, seed: int = 0):
+        self.answer = answer or local_receipt_answer
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.calls = 0
+        self._rng = random.Random(seed)
+
+    async def acomplete(self, prompt: str) -> str:
+        self.calls += 1
+        delay = max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms))
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        return self.answer(prompt)
+
+
+def create_backend(name: str = LLM_BACKEND) -> LLMBackend:
+    if name == "groq":
+        return GroqBackend()
+    if name == "local":
+        return LocalBackend()
+    raise ValueError(f"Unknown LLM backend: {name}")
+
+
+class TokenBucket:
+    """Allows `rate_per_s` acquisitions per second on average, with bursts of up to `burst`.
+
+    Only used from the client's event loop thread, so it needs no lock.
+    """
+
+    def __init__(self, rate_per_s: float, burst: int):
+        self.rate = rate_per_s
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self._updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def _is_retryable(error: BaseException) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # Provider SDKs raise their own transport errors (httpx, groq); match them by name
+    name = type(error).__name__
+    return any(word in name for word in ("Timeout", "Connection", "RateLimit", "Transport"))
+
+
+class LLMClient:
+    """Shared, rate-limited access to an LLM backend.
+
+    All calls run on one background event loop so the backend's async HTTP client
+    keeps its connections alive across requests. A semaphore caps in-flight calls,
+    a token bucket caps calls per minute, and each attempt has a timeout; timeouts,
+    rate limits and 5xx responses are retried with jittered exponential backoff.
+    Synchronous callers (job workers, batch ingestion) use `complete`/`complete_many`;
+    async code awaits `acomplete` from any event loop.
+    """
+
+    def __init__(
+        self,
+        backend: LLMBackend,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        rate_per_minute: float = LLM_RATE_PER_MINUTE,
+        burst: int = LLM_RATE_BURST,
+        timeout: float = LLM_TIMEOUT_S,
+        max_retries: int = LLM_MAX_RETRIES,
+        retry_base: float = LLM_RETRY_BASE_S,
+        retry_max: float = LLM_RETRY_MAX_S,
+    ):
+        self.backend = backend
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.max_retries = max(0, max_retries)
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self._bucket = TokenBucket(rate_per_minute / 60, burst) if rate_per_minute > 0 else None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    @property
+    def model_name(self) -> str:
+        return self.backend.model_name
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, daemon=True, name="llm-client").start()
+                    self._loop = loop
+        return self._loop
+
+    async def _call(self, prompt: str) -> str:
+        # Created here so it belongs to the client's loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                if self._bucket is not None:
+                    await self._bucket.acquire()
+                self.in_flight += 1
+                try:
+                    result = await asyncio.wait_for(self.backend.acomplete(prompt), self.timeout)
+                    LLM_REQUESTS.inc(outcome="ok")
+                    return result
+                except Exception as e:
+                    if not _is_retryable(e) or attempt >= self.max_retries:
+                        LLM_REQUESTS.inc(outcome="timeout" if isinstance(e, asyncio.TimeoutError) else "error")
+                        raise
+                    LLM_REQUESTS.inc(outcome="retry")
+                    error = e
+                finally:
+                    self.in_flight -= 1
+            # Back off outside the semaphore so waiting retries do not block other calls
+            delay = random.uniform(0, min(self.retry_max, self.retry_base * 2 ** attempt))
+            attempt += 1
+            logger.warning(
+                f"LLM call failed ({type(error).__name__}: {error}); retry {attempt}/{self.max_retries} in {delay:.2f}s"
+            )
+            await asyncio.sleep(delay)
+
+    async def _call_many(self, prompts: Sequence[str]) -> List[Union[str, BaseException]]:
+        return await asyncio.gather(*(self._call(prompt) for prompt in prompts), return_exceptions=True)
+
+    def complete(self, prompt: str) -> str:
+        """Blocking single completion; raises the last error once retries are exhausted"""
+        return asyncio.run_coroutine_threadsafe(self._call(prompt), self._ensure_loop()).result()
+
+    def complete_many(self, prompts: Sequence[str]) -> List[Union[str, Exception]]:
+        """Blocking concurrent completions; failures are returned in place"""
+        if not prompts:
+            return []
+        return asyncio.run_coroutine_threadsafe(self._call_many(prompts), self._ensure_loop()).result()
+
+    async def acomplete(self, prompt: str) -> str:
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._call(prompt), self._ensure_loop()))
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "model": self.model_name,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+        }
+
+
+_client: Optional[LLMClient] = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    """Process-wide client for the configured backend (LLM_BACKEND)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient(create_backend())
+    return _client
+
+
+def llm_client_loaded() -> bool:
+    return _client is not None
+
+
+def as_client(llm) -> LLMClient:
+    """Wrap an override passed to ReceiptProcessor: a client, a backend or a LangChain runnable"""
+    if llm is None:
+        return get_llm_client()
+    if isinstance(llm, LLMClient):
+        return llm
+    if isinstance(llm, LLMBackend):
+        return LLMClient(llm)
+    return LLMClient(RunnableBackend(llm))
+
+
+# Prompt packing: several short inputs in one prompt, answers split back out by id
+ITEM_PATTERN = re.compile(r'<receipt id="(\d+)">(.*?)</receipt>', re.DOTALL)
+RESULT_PATTERN = re.compile(r'<result id="(\d+)">(.*?)</result>', re.DOTALL)
+
+
+def pack_items(texts: Sequence[str]) -> str:
+    return "\n".join(f'<receipt id="{i}">\n{text}\n</receipt>' for i, text in enumerate(texts, 1))
+
+
+def split_results(response: str, count: int) -> List[Optional[str]]:
+    """Per-item answers from a packed response, in input order; None where an item is missing"""
+    results: List[Optional[str]] = [None] * count
+    for number, body in RESULT_PATTERN.findall(response):
+        index = int(number) - 1
+        if 0 <= index < count and results[index] is None:
+            results[index] = body
+    return results
+
+
+def plan_packs(lengths: Sequence[int], max_items: int, max_chars: int, item_max_chars: int) -> List[List[int]]:
+    """Group input indexes into packs; long inputs (or packing disabled) get a call of their own"""
+    packs: List[List[int]] = []
+    current: List[int] = []
+    current_chars = 0
+    for i, length in enumerate(lengths):
+        if max_items <= 1 or length > item_max_chars:
+            packs.append([i])
+            continue
+        if current and (len(current) >= max_items or current_chars + length > max_chars):
+            packs.append(current)
+            current, current_chars = [], 0
+        current.append(i)
+        current_chars += length
+    if current:
+        packs.append(current)
+    return packs
+
+
+def _tagged(fields: dict) -> str:
+    return "\n".join(
+        f"<{tag}>{fields.get(key) or ''}</{tag}>"
+        for tag, key in (("vendor", "vendor_name"), ("date", "date"), ("amount", "amount"),
+                         ("category", "category"), ("description", "description"))
+    )
+
+
+def local_receipt_answer(prompt: str) -> str:
+    """Answer a single or packed receipt prompt with the rule-based extractor"""
+    from Extraction import rule_extractor
+    items = ITEM_PATTERN.findall(prompt)
+    if items:
+        return "\n".join(
+            f'<result id="{number}">\n{_tagged(rule_extractor.extract(text.strip())[0])}\n</result>'
+            for number, text in items
+        )
+    return _tagged(rule_extractor.extract(prompt.split("Text:", 1)[-1].strip())[0])
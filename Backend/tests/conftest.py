@@ -0,0 +1,17 @@
+# conftest.py
+import os
+import sys
+import tempfile
+
+# The backend modules import each other by bare name (run from Backend/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importing db creates and migrates DATABASE_URL; keep tests off the local database and caches.
+# A file rather than sqlite:// because the endpoints run on threadpool threads and an
+# in-memory database is private to each connection
+_test_dir = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_test_dir, 'documents.db')}")
+os.environ.setdefault("CACHE_DB_PATH", os.path.join(_test_dir, "cache.db"))
+os.environ.setdefault("BLOB_STORE_DIR", os.path.join(_test_dir, "blobs"))
+# Parsing goes through the offline stand-in, never the hosted model
+os.environ.setdefault("LLM_BACKEND", "local")
@@ -0,0 +1,64 @@
+# test_documents_api.py
+"""Document endpoints, against the test database set up in conftest.py."""
+import pytest
+from fastapi.testclient import TestClient
+
+from app import app
+
+
+@pytest.fixture
+def client():
+    # Not used as a context manager, so the startup warm-up (OCR and LLM imports) never runs
+    return TestClient(app)
+
+
+def create(client, vendor, **fields):
+    doc = {"vendor": vendor, "date": "2024-03-05", "amount": 12.5, "category": "Groceries", **fields}
+    response = client.post("/documents/bulk", json=[doc])
+    assert response.status_code == 200, response.text
+    return response.json()["ids"][0]
+
+
+@pytest.mark.parametrize("values", [
+    {"amount": None},
+    {"date": None},
+    {"vendor": None},
+    {"category": "Dining", "amount": None},
+], ids=["amount", "date", "vendor", "mixed"])
+def test_bulk_patch_rejects_null_values(client, values):
+    doc_id = create(client, "Null Patch Market")
+    before = client.get(f"/documents/{doc_id}").json()
+
+    response = client.patch("/documents/bulk", json={"filters": {"vendor": "Null Patch"}, "values": values})
+
+    assert response.status_code == 400
+    assert "null" in response.json()["detail"]
+    assert client.get(f"/documents/{doc_id}").json() == before
+    listed = client.post("/filter_documents", json={"vendor": "Null Patch"})
+    assert listed.status_code == 200
+
+
+def test_bulk_patch_updates_matching_documents(client):
+    doc_id = create(client, "Bulk Patch Bakery")
+
+    response = client.patch("/documents/bulk", json={"filters": {"vendor": "Bulk Patch"}, "values": {"amount": 3.25}})
+
+    assert response.status_code == 200
+    assert response.json()["updated"] >= 1
+    assert client.get(f"/documents/{doc_id}").json()["amount"] == 3.25
+
+
+def test_bulk_patch_without_filter_needs_all(client):
+    response = client.patch("/documents/bulk", json={"values": {"category": "Other"}})
+    assert response.status_code == 400
+
+
+def test_stats_filters_match_filter_documents(client):
+    for vendor, category in (("  Stats Match Deli ", "Dining "), ("stats match deli", "DINING"), ("Stats Other", "Dining")):
+        create(client, vendor, category=category)
+    filters = {"vendor": "stats match", "category": "dining"}
+
+    listed = client.post("/filter_documents", json=filters).json()
+    by_period = client.post("/stats", json=filters).json()["by_period"]
+
+    assert sum(row["count"] for row in by_period) == listed["total"] == 2
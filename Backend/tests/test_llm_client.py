@@ -0,0 +1,91 @@
+# test_llm_client.py
+"""Retries, concurrency cap, rate limit and timeouts of the shared LLM client, against LocalBackend."""
+import asyncio
+import time
+
+import pytest
+
+from llm import LLMClient, LocalBackend
+
+
+class FlakyBackend(LocalBackend):
+    """Raises the given errors in order before answering"""
+
+    def __init__(self, errors, **kwargs):
+        super().__init__(answer=lambda prompt: "ok", **kwargs)
+        self.errors = list(errors)
+
+    async def acomplete(self, prompt):
+        answer = await super().acomplete(prompt)
+        if self.errors:
+            raise self.errors.pop(0)
+        return answer
+
+
+class PeakBackend(LocalBackend):
+    """Records the most calls it ever had running at once"""
+
+    def __init__(self, **kwargs):
+        super().__init__(answer=lambda prompt: prompt, **kwargs)
+        self.running = 0
+        self.peak = 0
+
+    async def acomplete(self, prompt):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            return await super().acomplete(prompt)
+        finally:
+            self.running -= 1
+
+
+def client_for(backend, **kwargs):
+    options = {"max_concurrency": 4, "rate_per_minute": 0, "timeout": 5, "max_retries": 3, "retry_base": 0.001, "retry_max": 0.01}
+    return LLMClient(backend, **{**options, **kwargs})
+
+
+def test_retryable_errors_are_retried():
+    backend = FlakyBackend([ConnectionError("reset"), asyncio.TimeoutError()])
+    assert client_for(backend).complete("hi") == "ok"
+    assert backend.calls == 3
+
+
+def test_retries_give_up_with_the_last_error():
+    backend = FlakyBackend([ConnectionError("reset")] * 5)
+    with pytest.raises(ConnectionError):
+        client_for(backend, max_retries=2).complete("hi")
+    assert backend.calls == 3
+
+
+def test_non_retryable_errors_raise_immediately():
+    backend = FlakyBackend([ValueError("bad request")])
+    with pytest.raises(ValueError):
+        client_for(backend).complete("hi")
+    assert backend.calls == 1
+
+
+def test_slow_calls_time_out():
+    with pytest.raises(asyncio.TimeoutError):
+        client_for(LocalBackend(latency_ms=500), timeout=0.05, max_retries=0).complete("hi")
+
+
+def test_semaphore_caps_calls_in_flight():
+    backend = PeakBackend(latency_ms=20)
+    prompts = [str(i) for i in range(12)]
+
+    assert client_for(backend, max_concurrency=3).complete_many(prompts) == prompts
+    assert backend.peak == 3
+
+
+def test_complete_many_returns_failures_in_place():
+    backend = FlakyBackend([ValueError("bad request")])
+    results = client_for(backend, max_concurrency=1).complete_many(["a", "b"])
+    assert isinstance(results[0], ValueError) and results[1] == "ok"
+
+
+def test_token_bucket_spaces_calls_after_the_burst():
+    # 600/min = one token every 0.1 s; the first two calls use the burst, the other three wait
+    client = client_for(LocalBackend(), rate_per_minute=600, burst=2)
+    start = time.monotonic()
+    client.complete_many(["x"] * 5)
+    assert time.monotonic() - start >= 0.25
@@ -0,0 +1,87 @@
+# test_parsing.py
+"""ReceiptProcessor only calls the LLM when neither the rule fast path nor the parse cache can answer."""
+import pytest
+
+from cache import PersistentCache
+from Extraction import ReceiptProcessor, RuleBasedExtractor
+from llm import LocalBackend
+
+RECEIPT = "Corner Bakery\n2024-03-05\nSourdough 6.50\nCoffee 3.25\nGrand Total 9.75"
+UNKNOWN_RECEIPT = "Some Shop\nthanks for visiting\nTotal 4.20"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PersistentCache(str(tmp_path / "cache.db"), "parse_cache", 100)
+
+
+@pytest.fixture
+def backend():
+    return LocalBackend()
+
+
+@pytest.fixture
+def rules():
+    extractor = RuleBasedExtractor()
+    extractor.load_vendor_categories({"Corner Bakery": "Food"})
+    return extractor
+
+
+def test_parse_cache_hit_skips_the_llm(backend, cache):
+    processor = ReceiptProcessor(llm=backend, cache=cache, fast_path=None)
+
+    first = processor._parse_receipt_text(UNKNOWN_RECEIPT)
+    # Case and whitespace differences in the OCR output share a cache entry
+    second = processor._parse_receipt_text("  some shop\n\nTHANKS for visiting  total 4.20 ")
+
+    assert second == first
+    assert backend.calls == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_parse_cache_is_keyed_by_model(cache):
+    ReceiptProcessor(llm=LocalBackend(), cache=cache, fast_path=None)._parse_receipt_text(UNKNOWN_RECEIPT)
+    other_model = LocalBackend()
+    other_model.model_name = "local-v2"
+
+    ReceiptProcessor(llm=other_model, cache=cache, fast_path=None)._parse_receipt_text(UNKNOWN_RECEIPT)
+
+    assert other_model.calls == 1
+
+
+def test_parse_batch_only_sends_cache_misses(backend, cache):
+    processor = ReceiptProcessor(llm=backend, cache=cache, fast_path=None)
+    processor._parse_receipt_text(UNKNOWN_RECEIPT)
+    backend.calls = 0
+
+    results = processor.parse_batch([UNKNOWN_RECEIPT, "Other Shop\nTotal 1.00"])
+
+    assert all(isinstance(result, dict) for result in results)
+    assert backend.calls == 1
+
+
+def test_fast_path_answers_known_vendors(backend, cache, rules):
+    parsed = ReceiptProcessor(llm=backend, cache=cache, fast_path=rules)._parse_receipt_text(RECEIPT)
+
+    assert (parsed["vendor_name"], parsed["category"], parsed["amount"]) == ("Corner Bakery", "Food", 9.75)
+    assert backend.calls == 0
+    assert rules.hits == 1
+
+
+def test_fast_path_falls_back_to_the_llm_below_threshold(backend, cache, rules):
+    ReceiptProcessor(llm=backend, cache=cache, fast_path=rules)._parse_receipt_text(UNKNOWN_RECEIPT)
+
+    assert backend.calls == 1
+    assert (rules.attempts, rules.hits) == (1, 0)
+
+
+def test_fast_path_defers_while_the_vendor_table_loads(backend, cache, rules):
+    processor = ReceiptProcessor(llm=backend, cache=cache, fast_path=rules)
+    rules.begin_loading()
+
+    processor._parse_receipt_text(RECEIPT)
+    assert backend.calls == 1
+
+    rules.load_vendor_categories({"Corner Bakery": "Food"})
+    processor._parse_receipt_text("Corner Bakery\n2024-03-06\nGrand Total 3.00")
+    assert backend.calls == 1
@@ -0,0 +1,42 @@
+# test_query_plans.py
+"""The common document filters must be answered from an index, never a full table scan."""
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from db import Base, DocumentFilter, encode_cursor, explain_filter_plan
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'plans.db'}")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def assert_uses_index(plan):
+    assert any("USING INDEX" in step or "USING COVERING INDEX" in step for step in plan), plan
+    assert not any(step.strip() == "SCAN documents" for step in plan), plan
+
+
+@pytest.mark.parametrize("filters", [
+    DocumentFilter(vendor="Wal"),
+    DocumentFilter(category="Groceries"),
+    DocumentFilter(startDate=date(2024, 1, 1), endDate=date(2024, 3, 31)),
+    DocumentFilter(vendor="Wal", category="Groceries", startDate=date(2024, 1, 1), endDate=date(2024, 3, 31)),
+], ids=["vendor_prefix", "category", "date_range", "combined"])
+def test_filter_uses_index(db, filters):
+    assert_uses_index(explain_filter_plan(db, filters))
+
+
+@pytest.mark.parametrize("filters", [
+    DocumentFilter(),
+    DocumentFilter(category="Groceries"),
+], ids=["unfiltered", "category"])
+def test_keyset_cursor_uses_index(db, filters):
+    cursor = encode_cursor(date(2024, 2, 15), 1000)
+    assert_uses_index(explain_filter_plan(db, filters, cursor=cursor))
@@ -0,0 +1,72 @@
+# test_reprocess.py
+"""Re-parsing stored OCR text must not undo corrections made by hand."""
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import _reprocess_documents, app
+from db import MANUAL_EXTRACTOR_VERSION, DocumentFilter, SessionLocal, get_document_by_id, insert
+
+OCR_TEXT = "ACME HARDWARE\n2024-02-01\nHammer 19.99\nTOTAL 19.99"
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def vendor():
+    # The test database is shared; a vendor prefix per test keeps each test's documents apart
+    return f"Reprocess {uuid4().hex[:8]}"
+
+
+@pytest.fixture
+def docs(client, vendor):
+    """An untouched and a hand-corrected document parsed by an older extractor"""
+    with SessionLocal() as db:
+        ids = [
+            insert(db, f"{vendor} {i}", "", 1.0, "Other", "2024-02-01",
+                   ocr_text=OCR_TEXT, extractor_version="prompt-0/old").id
+            for i in range(2)
+        ]
+    corrected = {"vendor": f"{vendor} Fixed", "date": "2024-02-02", "amount": 42.0, "category": "Tools", "data": "fixed"}
+    assert client.put(f"/documents/{ids[1]}", json=corrected).status_code == 200
+    return ids
+
+
+def fetch(doc_id):
+    with SessionLocal() as db:
+        return get_document_by_id(db, doc_id)
+
+
+def test_reprocess_keeps_manual_edits(docs, vendor):
+    untouched, edited = docs
+    before = fetch(edited)
+
+    summary = _reprocess_documents(DocumentFilter(vendor=vendor), force=False)
+
+    assert summary["processed"] == 1
+    assert summary["skipped_manual_edits"] == 1
+    assert fetch(edited) == before
+    assert fetch(untouched)["amount"] == 19.99
+
+
+def test_bulk_patch_marks_documents_manual(client, docs, vendor):
+    untouched, _ = docs
+    response = client.patch("/documents/bulk", json={"filters": {"vendor": vendor}, "values": {"category": "Tools"}})
+    assert response.status_code == 200
+    assert client.get(f"/documents/{untouched}/text").json()["extractor_version"] == MANUAL_EXTRACTOR_VERSION
+
+    summary = _reprocess_documents(DocumentFilter(vendor=vendor), force=False)
+    assert summary["processed"] == 0
+
+
+def test_forced_reprocess_overwrites_manual_edits(docs, vendor):
+    _, edited = docs
+
+    summary = _reprocess_documents(DocumentFilter(vendor=vendor), force=True)
+
+    assert summary["processed"] == 2
+    assert fetch(edited)["amount"] == 19.99
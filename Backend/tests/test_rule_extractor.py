@@ -0,0 +1,34 @@
+# test_rule_extractor.py
+"""The rule-based fast path and its learned vendor table."""
+import pytest
+
+from Extraction import RuleBasedExtractor
+
+
+@pytest.fixture
+def rules():
+    extractor = RuleBasedExtractor()
+    extractor.load_vendor_categories({"Toys R Us.": "Shopping", "Cafe": "Food", "AT&T": "Utilities"})
+    return extractor
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("TOYS R US.\nStore 42", ("Toys R Us.", "Shopping")),
+    ("at&t\nmonthly statement", ("AT&T", "Utilities")),
+    ("The Cafe\nLatte 4.50", ("Cafe", "Food")),
+    ("Cafeteria\nLunch 8.00", None),
+], ids=["trailing_punctuation", "inner_punctuation", "word", "no_partial_word"])
+def test_match_known_vendor(rules, text, expected):
+    assert rules._match_known_vendor(text) == expected
+
+
+def test_relearning_a_vendor_keeps_the_compiled_pattern(rules):
+    rules._match_known_vendor("warm up")
+    pattern = rules._vendor_pattern
+
+    rules.learn("cafe", "Dining")
+    assert rules._vendor_pattern is pattern
+    assert rules._match_known_vendor("CAFE") == ("cafe", "Dining")
+
+    rules.learn("Bakery Corner", "Food")
+    assert rules._match_known_vendor("Bakery Corner\nBread 3.00") == ("Bakery Corner", "Food")
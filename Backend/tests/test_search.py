@@ -0,0 +1,41 @@
+# test_search.py
+"""Full-text search (DocumentFilter.q) covers the stored OCR text as well as the parsed fields."""
+from uuid import uuid4
+
+import pytest
+
+from db import DocumentFilter, SessionLocal, delete_document_by_id, filter_documents, insert, update_parsed_fields
+
+
+@pytest.fixture
+def word():
+    # A term no other test's documents contain
+    return f"zq{uuid4().hex[:10]}"
+
+
+def search(q):
+    with SessionLocal() as db:
+        return [doc["id"] for doc in filter_documents(db, DocumentFilter(q=q))["results"]]
+
+
+def test_search_matches_ocr_text(word):
+    with SessionLocal() as db:
+        doc_id = insert(db, "Airport Cabs", "ride", 30.0, "Transport", "2024-05-01",
+                        ocr_text=f"AIRPORT CABS\nTerminal {word} pickup\nTotal 30.00").id
+
+    assert search(word) == [doc_id]
+    assert search(f"airport {word}") == [doc_id]
+
+
+def test_search_index_follows_updates_and_deletes(word):
+    with SessionLocal() as db:
+        doc_id = insert(db, f"{word} Books", "", 12.0, "Shopping", "2024-05-02", ocr_text="BOOK SHOP\nTotal 12.00").id
+    with SessionLocal() as db:
+        update_parsed_fields(db, [{"id": doc_id, "vendor": "Book Shop", "amount": 12.0, "category": "Shopping",
+                                   "date": "2024-05-02", "data": "", "extractor_version": "test"}])
+    assert search(word) == []
+    assert search("book shop") != []
+
+    with SessionLocal() as db:
+        delete_document_by_id(db, doc_id)
+    assert doc_id not in search("book shop")
@@ -0,0 +1,152 @@
+# uploads.py
+import hashlib
+import os
+import tempfile
+import zipfile
+from dataclasses import dataclass
+from typing import BinaryIO, Callable, List, Optional
+
+from config import MAX_UPLOAD_BYTES, UPLOAD_CHUNK_SIZE
+
+
+class UploadTooLarge(ValueError):
+    """An upload, archive member or expanded archive exceeded its size limit; the API answers 413"""
+
+    def __init__(self, filename: str, max_bytes: int, limit: str = "upload"):
+        super().__init__(f"'{filename}' is larger than the {max_bytes // (1024 * 1024)} MB {limit} limit")
+        self.filename = filename
+        self.max_bytes = max_bytes
+
+
+class TooManyFiles(ValueError):
+    """An archive (or batch) holds more files than allowed; the API answers 413"""
+
+    def __init__(self, filename: str, max_files: int):
+        super().__init__(f"'{filename}' holds more than {max_files} files")
+        self.filename = filename
+        self.max_files = max_files
+
+
+@dataclass
+class SpooledUpload:
+    """An upload written to a temporary file, with its SHA-256 and size computed on the way in"""
+    filename: str
+    path: str
+    digest: str
+    size: int
+
+    @property
+    def extension(self) -> str:
+        return os.path.splitext(self.filename)[1].lower()
+
+    def discard(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class _Spooler:
+    """Writes chunks to a temp file while hashing them and enforcing the size limit"""
+
+    def __init__(self, filename: str, spool_dir: Optional[str], max_bytes: int):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._digest = hashlib.sha256()
+        fd, self.path = tempfile.mkstemp(dir=spool_dir, prefix="upload-", suffix=os.path.splitext(filename)[1].lower())
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(self.filename, self.max_bytes)
+        self._digest.update(chunk)
+        self._file.write(chunk)
+
+    def finish(self) -> SpooledUpload:
+        self._file.close()
+        return SpooledUpload(self.filename, self.path, self._digest.hexdigest(), self.size)
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+async def spool_upload(file, spool_dir: Optional[str] = None, max_bytes: int = MAX_UPLOAD_BYTES,
+                       run_sync: Optional[Callable] = None) -> SpooledUpload:
+    """Copy an UploadFile to disk in UPLOAD_CHUNK_SIZE pieces, so memory use does not grow with the file.
+
+    `run_sync(fn, *args)` runs blocking writes off the event loop (e.g. run_in_threadpool).
+    """
+    spooler = _Spooler(file.filename or "upload", spool_dir, max_bytes)
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            if run_sync is not None:
+                await run_sync(spooler.write, chunk)
+            else:
+                spooler.write(chunk)
+        return spooler.finish()
+    except BaseException:
+        spooler.abort()
+        raise
+
+
+def spool_stream(filename: str, stream: BinaryIO, spool_dir: Optional[str] = None,
+                 max_bytes: int = MAX_UPLOAD_BYTES) -> SpooledUpload:
+    """Blocking counterpart of spool_upload for file-like sources such as zip members"""
+    spooler = _Spooler(filename, spool_dir, max_bytes)
+    try:
+        for chunk in iter(lambda: stream.read(UPLOAD_CHUNK_SIZE), b""):
+            spooler.write(chunk)
+        return spooler.finish()
+    except BaseException:
+        spooler.abort()
+        raise
+
+
+def expand_zip(upload: SpooledUpload, spool_dir: Optional[str] = None, max_bytes: int = MAX_UPLOAD_BYTES,
+               max_total_bytes: Optional[int] = None, max_members: Optional[int] = None) -> List[SpooledUpload]:
+    """Spool each member of a zip upload to its own file; the archive itself is discarded.
+
+    `max_bytes` limits each uncompressed member, `max_total_bytes` their combined size
+    and `max_members` their number. The limits are checked against the actual bytes
+    written, not the sizes the archive declares, so a small zip bomb cannot fill the disk.
+    """
+    members: List[SpooledUpload] = []
+    total = 0
+    try:
+        with zipfile.ZipFile(upload.path) as archive:
+            infos = [
+                info for info in archive.infolist()
+                if not info.is_dir() and os.path.basename(info.filename) and not os.path.basename(info.filename).startswith(".")
+            ]
+            if max_members is not None and len(infos) > max_members:
+                raise TooManyFiles(upload.filename, max_members)
+            for info in infos:
+                name = os.path.basename(info.filename)
+                if info.file_size > max_bytes:
+                    raise UploadTooLarge(name, max_bytes)
+                limit = max_bytes
+                if max_total_bytes is not None:
+                    if total + info.file_size > max_total_bytes:
+                        raise UploadTooLarge(upload.filename, max_total_bytes, "expanded archive")
+                    limit = min(max_bytes, max_total_bytes - total)
+                try:
+                    with archive.open(info) as member:
+                        spooled = spool_stream(name, member, spool_dir, limit)
+                except UploadTooLarge:
+                    if limit < max_bytes:
+                        raise UploadTooLarge(upload.filename, max_total_bytes, "expanded archive") from None
+                    raise
+                members.append(spooled)
+                total += spooled.size
+    except BaseException:
+        for member in members:
+            member.discard()
+        raise
+    finally:
+        upload.discard()
+    return members
@@ -10,7 +10,8 @@ export const AppProvider = ({ children }) => {
     endDate: '',
     minAmount: '',
     maxAmount: '',
-    category: ''
+    category: '',
+    q: ''
   });
   const [receipts, setReceipts] = useState([]);
   const [offset, setOffset] = useState(0);
@@ -1,4 +1,4 @@
-import React, { useContext, useState, useMemo } from 'react';
+import React, { useContext, useState, useMemo, useEffect } from 'react';
 import { AppContext } from './AppContext';
 import '../App.css';
 import {
@@ -11,38 +11,42 @@ import dayjs from 'dayjs'; // 🟢 Make sure this is installed
 const COLORS = ['#8884d8', '#82ca9d', '#ffc658', '#ff8042', '#00C49F'];
 
 function Charts() {
-  const { receipts } = useContext(AppContext);
+  const { filters } = useContext(AppContext);
   const [chartType, setChartType] = useState('pie');
+  const [stats, setStats] = useState({ by_category: [], by_period: [] });
 
-  // 📦 Aggregate by category (for pie/bar)
-  const chartData = useMemo(() => {
-    const categoryMap = {};
-    receipts.forEach((doc) => {
-      const category = doc.category || 'Uncategorized';
-      if (!categoryMap[category]) {
-        categoryMap[category] = 0;
-      }
-      categoryMap[category] += parseFloat(doc.amount);
-    });
-    return Object.entries(categoryMap).map(([name, value]) => ({ name, value }));
-  }, [receipts]);
+  // 🔑 The filter values as a string, so an equal filters object (or a new page of receipts) is no change
+  const filterBody = useMemo(
+    () => JSON.stringify(
+      Object.fromEntries(Object.entries(filters).map(([key, value]) => [key, value === '' ? null : value]))
+    ),
+    [filters]
+  );
+
+  // 📦 Totals are aggregated server-side; refetch when the filters change (and on mount, i.e. each
+  // time the chart view is opened, which picks up documents added or edited meanwhile)
+  useEffect(() => {
+    fetch('http://localhost:8000/stats?period=month', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: filterBody
+    })
+      .then((res) => res.json())
+      .then(setStats)
+      .catch((err) => console.error('Failed to fetch stats:', err));
+  }, [filterBody]);
 
-  // 📆 Aggregate by month (for line)
-  const lineChartData = useMemo(() => {
-    const monthMap = {};
-    receipts.forEach((doc) => {
-      const month = dayjs(doc.date).format('MMM YYYY'); // e.g., "Jul 2025"
-      if (!monthMap[month]) {
-        monthMap[month] = 0;
-      }
-      monthMap[month] += parseFloat(doc.amount);
-    });
+  // Category totals (for pie/bar)
+  const chartData = useMemo(
+    () => stats.by_category.map(({ name, total }) => ({ name, value: total })),
+    [stats]
+  );
 
-    // Optional: sort by month chronologically
-    return Object.entries(monthMap)
-      .sort((a, b) => dayjs(a[0], 'MMM YYYY').unix() - dayjs(b[0], 'MMM YYYY').unix())
-      .map(([name, value]) => ({ name, value }));
-  }, [receipts]);
+  // 📆 Monthly totals (for line), already in chronological order
+  const lineChartData = useMemo(
+    () => stats.by_period.map(({ period, total }) => ({ name: dayjs(period).format('MMM YYYY'), value: total })),
+    [stats]
+  );
 
   const [activeIndex, setActiveIndex] = useState(null);
   const handlePieClick = (data, index) => {
@@ -18,6 +18,8 @@ function ContentLeft() {
   const [loading, setLoading] = useState(false);
   const observer = useRef();
   const lastRowRef = useRef(null);
+  // Keyset cursor for the next page; '' requests the first page
+  const cursorRef = useRef('');
   const limit = 20;
 
   const cleanFilters = Object.fromEntries(
@@ -30,7 +32,7 @@ function ContentLeft() {
 
     try {
       const response = await fetch(
-        `http://localhost:8000/filter_documents?offset=${offset}&limit=${limit}`,
+        `http://localhost:8000/filter_documents?cursor=${encodeURIComponent(cursorRef.current)}&limit=${limit}&include_total=false`,
         {
           method: 'POST',
           headers: { 'Content-Type': 'application/json' },
@@ -46,7 +48,8 @@ function ContentLeft() {
       } else {
         setReceipts((prev) => offset === 0 ? data.results : [...prev, ...data.results]);
         setOffset((prev) => prev + data.results.length);
-        setHasMore(data.results.length === limit);
+        cursorRef.current = data.next_cursor || '';
+        setHasMore(Boolean(data.next_cursor));
       }
     } catch (error) {
       console.error('Error loading documents:', error);
@@ -63,10 +66,11 @@ function ContentLeft() {
       setOffset(0);
       setHasMore(true);
       setLoading(true);
+      cursorRef.current = '';
 
       try {
         const response = await fetch(
-          `http://localhost:8000/filter_documents?offset=0&limit=${limit}`,
+          `http://localhost:8000/filter_documents?cursor=&limit=${limit}&include_total=false`,
           {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
@@ -78,7 +82,8 @@ function ContentLeft() {
         const data = await response.json();
         setReceipts(data.results);
         setOffset(data.results.length);
-        setHasMore(data.results.length === limit);
+        cursorRef.current = data.next_cursor || '';
+        setHasMore(Boolean(data.next_cursor));
       } catch (err) {
         console.error('Initial load failed:', err);
       } finally {
@@ -41,6 +41,26 @@ function Input() {
         fileInputRef.current.value = null;
     };
 
+    // Poll the background ingestion job until it finishes
+    const waitForJob = (jobId) =>
+        new Promise((resolve, reject) => {
+            const poll = () => {
+                fetch(`http://127.0.0.1:8000/jobs/${jobId}`)
+                    .then((res) => res.json())
+                    .then((job) => {
+                        if (job.status === "succeeded") {
+                            resolve(job.result);
+                        } else if (job.status === "failed") {
+                            reject(new Error(job.error));
+                        } else {
+                            setTimeout(poll, 1000);
+                        }
+                    })
+                    .catch(reject);
+            };
+            poll();
+        });
+
     const handleUpload = () => {
         if (!selectedFile) {
             alert("Please select a file first.");
@@ -60,6 +80,8 @@ function Input() {
             .then((data) => {
                 // alert("File uploaded successfully!");
                 console.log(data);
+                // Duplicate uploads are answered from the cache without a job
+                return data.job_id ? waitForJob(data.job_id) : data;
             })
             .then(()=>{
                 fetch("http://127.0.0.1:8000/documents")
@@ -46,7 +46,8 @@ function Search() {
       endDate: '',
       minAmount: '',
       maxAmount: '',
-      category: ''
+      category: '',
+      q: ''
     };
     setFilters(cleared);
     setReceipts([]);
@@ -57,6 +58,11 @@ function Search() {
   return (
     <div className="Search">
       <div className="filter-container">
+        <div className="filter-group">
+          <label>Search:</label>
+          <input type="text" name="q" placeholder="e.g. uber airport" value={filters.q} onChange={handleChange} />
+        </div>
+
         <div className="filter-group">
           <label>Name / Vendor:</label>
           <input type="text" name="vendor" value={filters.vendor} onChange={handleChange} />